@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Lower value runs first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+
+class AdmissionRejected(Exception):
+    """The queue is full; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int, queued: int):
+        super().__init__(f"Server busy ({queued} runs queued)")
+        self.retry_after = retry_after
+        self.queued = queued
+
+
+def classify_priority(priority: str | None, test_count: int) -> str:
+    """Explicit priority wins; otherwise single-scenario runs are interactive"""
+    if priority in PRIORITIES:
+        return priority
+    return "interactive" if test_count <= 1 else "bulk"
+
+
+class AdmissionController:
+    """Bounded, priority-ordered, tenant-aware admission for runs.
+
+    At most `max_active` runs execute at once; up to `max_queued` more wait,
+    interactive before bulk and FIFO within a class. Anything beyond that is
+    rejected straight away with a Retry-After estimated from recent run
+    durations.
+
+    No tenant holds more than `tenant_cap` runs at once, and
+    `interactive_reserve` slots are kept for interactive runs, so one
+    tenant's long bulk suites can't shut everyone else out.
+    """
+
+    def __init__(
+        self,
+        max_active: int,
+        max_queued: int,
+        tenant_cap: int | None = None,
+        interactive_reserve: int = 1,
+    ):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.tenant_cap = tenant_cap or max_active
+        self.interactive_reserve = min(max(0, interactive_reserve), max_active - 1)
+        self.active = 0
+        self.active_by_tenant: dict[str, int] = {}
+        self.waiting: list = []
+        self.sequence = itertools.count()
+        # EWMA of run duration, seeded with a typical single call
+        self.avg_run_seconds = 120.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self.waiting if not future.done())
+
+    def _can_start(self, priority: str, tenant: str) -> bool:
+        limit = self.max_active
+        if priority != "interactive":
+            limit -= self.interactive_reserve
+        return (
+            self.active < limit
+            and self.active_by_tenant.get(tenant, 0) < self.tenant_cap
+        )
+
+    def _start(self, tenant: str):
+        self.active += 1
+        self.active_by_tenant[tenant] = self.active_by_tenant.get(tenant, 0) + 1
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        ahead = self.queued + 1
+        return max(1, math.ceil(ahead * self.avg_run_seconds / self.max_active))
+
+    def _wake(self):
+        self.waiting = [job for job in self.waiting if not job[-1].done()]
+        heapq.heapify(self.waiting)
+        for job in sorted(self.waiting):
+            if self.active >= self.max_active:
+                break
+            _, _, priority, tenant, future = job
+            if self._can_start(priority, tenant):
+                self.waiting.remove(job)
+                self._start(tenant)
+                future.set_result(None)
+        heapq.heapify(self.waiting)
+
+    def _record(self, seconds: float):
+        self.avg_run_seconds = 0.8 * self.avg_run_seconds + 0.2 * seconds
+
+    def reserve(self, priority: str, tenant: str = "default") -> "Ticket":
+        """Take a run slot or a queue position; raises AdmissionRejected when full.
+
+        Synchronous so the capacity check and the enqueue cannot interleave
+        with another request.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self._can_start(priority, tenant):
+            self._start(tenant)
+            future.set_result(None)
+        elif self.queued >= self.max_queued:
+            raise AdmissionRejected(self.retry_after(), self.queued)
+        else:
+            heapq.heappush(
+                self.waiting,
+                (PRIORITIES[priority], next(self.sequence), priority, tenant, future),
+            )
+        return Ticket(self, future, tenant)
+
+    def release(self, tenant: str, seconds: float | None):
+        if seconds is not None:
+            self._record(seconds)
+        self.active -= 1
+        self.active_by_tenant[tenant] -= 1
+        self._wake()
+
+    def status(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+            "active_by_tenant": {t: n for t, n in self.active_by_tenant.items() if n},
+            "avg_run_seconds": round(self.avg_run_seconds, 1),
+        }
+
+
+class Ticket:
+    """A reserved place in the admission queue; `async with` waits for the slot"""
+
+    def __init__(self, controller: AdmissionController, future: asyncio.Future, tenant: str):
+        self.controller = controller
+        self.future = future
+        self.tenant = tenant
+        self.started = None
+        self.settled = False
+        # Only runs that completed feed the duration estimate
+        self.completed = True
+
+    async def __aenter__(self):
+        try:
+            await self.future
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        self.settled = True
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, *exc_info):
+        seconds = time.monotonic() - self.started
+        if exc_type is not None or not self.completed:
+            # A cancelled or failed run says little about how long runs take
+            seconds = None
+        self.controller.release(self.tenant, seconds)
+
+    def failed(self):
+        """Release without counting this run's duration"""
+        self.completed = False
+
+    def cancel(self):
+        """Give up the place if it was never used; hands a granted slot on"""
+        if self.settled:
+            return
+        self.settled = True
+        if self.future.done() and not self.future.cancelled():
+            self.controller.release(self.tenant, None)
+        self.future.cancel()
@@ -0,0 +1,205 @@
+"""Latency benchmark driver for the media-stream bot.
+
+Plays the Twilio side of one or more calls against the bot's /ws endpoint:
+sends the connected/start events, then streams 8kHz mu-law audio in real
+time. That is silence, plus a burst of synthetic speech for each user
+turn. It measures:
+
+    time to first audio   start event -> first media frame from the bot
+    turn latency          end of a user utterance -> first bot audio after it
+
+Run the bot with the local stand-ins, then the driver:
+
+    BOT_SERVICES=local uvicorn main:app --port 8765
+    python bench_driver.py --calls 4 --turns 5
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+import uuid
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def ulaw_encode(pcm: np.ndarray) -> bytes:
+    """G.711 mu-law encoding of int16 samples (same output as audioop.lin2ulaw)"""
+    value = pcm.astype(np.int32) >> 2
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    value = np.minimum(np.abs(value), 8159) + 0x21
+    segment_ends = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    segment = np.searchsorted(segment_ends, value)
+    encoded = np.where(
+        segment >= 8, 0x7F, (segment << 4) | ((value >> (segment + 1)) & 0x0F)
+    )
+    return (encoded ^ mask).astype(np.uint8).tobytes()
+
+
+def synthetic_speech(seconds: float, seed: int) -> list[bytes]:
+    """Noise with a syllable-rate envelope, split into 20ms mu-law frames"""
+    rng = np.random.default_rng(seed)
+    n = int(SAMPLE_RATE * seconds) // FRAME_SAMPLES * FRAME_SAMPLES
+    t = np.arange(n) / SAMPLE_RATE
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t)
+    pcm = (rng.normal(0, 0.25, n) * envelope * 32767).clip(-32768, 32767).astype(np.int16)
+    return [ulaw_encode(pcm[i : i + FRAME_SAMPLES]) for i in range(0, n, FRAME_SAMPLES)]
+
+
+SILENCE = ulaw_encode(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+
+
+class Call:
+    """One simulated Twilio media stream"""
+
+    def __init__(self, url: str, index: int, args):
+        self.url = url
+        self.index = index
+        self.args = args
+        self.stream_sid = f"MZ{uuid.uuid4().hex}"
+        self.speech: list[bytes] = []
+        self.last_audio_at = None
+        self.audio_event = asyncio.Event()
+        self.time_to_first_audio = None
+        self.turn_latencies: list[float] = []
+        self.timeouts = 0
+
+    async def send_audio(self, ws):
+        """Real-time 20ms frames: queued speech if any, silence otherwise"""
+        next_at = time.monotonic()
+        while True:
+            payload = self.speech.pop(0) if self.speech else SILENCE
+            await ws.send(
+                json.dumps(
+                    {
+                        "event": "media",
+                        "streamSid": self.stream_sid,
+                        "media": {"payload": base64.b64encode(payload).decode()},
+                    }
+                )
+            )
+            next_at += FRAME_MS / 1000
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    async def receive(self, ws):
+        async for message in ws:
+            if json.loads(message).get("event") == "media":
+                self.last_audio_at = time.monotonic()
+                self.audio_event.set()
+
+    async def audio_after(self, since: float) -> float | None:
+        """Seconds from `since` to the first bot audio after it, or None on timeout"""
+        deadline = since + self.args.timeout
+        while self.last_audio_at is None or self.last_audio_at <= since:
+            self.audio_event.clear()
+            try:
+                await asyncio.wait_for(self.audio_event.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                return None
+        return self.last_audio_at - since
+
+    async def bot_quiet(self):
+        """Wait until the bot has sent no audio for --quiet-ms"""
+        quiet = self.args.quiet_ms / 1000
+        while self.last_audio_at and time.monotonic() - self.last_audio_at < quiet:
+            await asyncio.sleep(quiet / 4)
+
+    async def run(self):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await ws.send(
+                json.dumps(
+                    {
+                        "event": "start",
+                        "streamSid": self.stream_sid,
+                        "start": {
+                            "streamSid": self.stream_sid,
+                            "callSid": f"CA{uuid.uuid4().hex}",
+                            "mediaFormat": {
+                                "encoding": "audio/x-mulaw",
+                                "sampleRate": SAMPLE_RATE,
+                                "channels": 1,
+                            },
+                        },
+                    }
+                )
+            )
+            started = time.monotonic()
+            tasks = [
+                asyncio.create_task(self.send_audio(ws)),
+                asyncio.create_task(self.receive(ws)),
+            ]
+            try:
+                # The bot greets the caller as soon as the stream starts
+                self.time_to_first_audio = await self.audio_after(started)
+                for turn in range(self.args.turns):
+                    await self.bot_quiet()
+                    self.speech = synthetic_speech(
+                        self.args.speech_ms / 1000, seed=self.index * 1000 + turn
+                    )
+                    while self.speech:
+                        await asyncio.sleep(FRAME_MS / 1000)
+                    latency = await self.audio_after(time.monotonic())
+                    if latency is None:
+                        self.timeouts += 1
+                    else:
+                        self.turn_latencies.append(latency)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    ms = np.array(values) * 1000
+    return {
+        "n": len(values),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p90_ms": round(float(np.percentile(ms, 90)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "max_ms": round(float(ms.max()), 1),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    calls = [Call(args.url, index, args) for index in range(args.calls)]
+    outcomes = await asyncio.gather(*[call.run() for call in calls], return_exceptions=True)
+    failed = [str(outcome) for outcome in outcomes if isinstance(outcome, Exception)]
+    first_audio = [c.time_to_first_audio for c in calls if c.time_to_first_audio is not None]
+    return {
+        "calls": args.calls,
+        "failed_calls": failed,
+        "time_to_first_audio": percentiles(first_audio),
+        "turn_latency": percentiles([latency for c in calls for latency in c.turn_latencies]),
+        "turn_timeouts": sum(c.timeouts for c in calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="ws://localhost:8765/ws")
+    parser.add_argument("--calls", type=int, default=1, help="concurrent calls")
+    parser.add_argument("--turns", type=int, default=4, help="user turns per call")
+    parser.add_argument("--speech-ms", type=int, default=1200)
+    parser.add_argument("--quiet-ms", type=int, default=800, help="bot silence that ends its turn")
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for the bot")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
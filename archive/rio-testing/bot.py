@@ -3,67 +3,83 @@ import sys
 
 # import toml
 
+from dotenv import load_dotenv
 from loguru import logger
 from pipecat.frames.frames import LLMMessagesFrame, EndFrame
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineTask, PipelineParams
 
-from pipecat.services.openai import OpenAILLMService
 from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
-from pipecat.services.deepgram import DeepgramSTTService
-from pipecat.vad.silero import SileroVADAnalyzer
-from twilio.rest import Client
 from pipecat.transports.network.fastapi_websocket import (
     FastAPIWebsocketTransport,
     FastAPIWebsocketParams,
 )
 
 from pipecat.serializers.twilio import TwilioFrameSerializer
-from pipecat.services.cartesia import CartesiaTTSService
-
-from openai.types.chat import ChatCompletionToolParam
-from query_function import query_tool
 
 logger.remove(0)
-logger.add(sys.stderr, level="DEBUG")
+logger.add(sys.stderr, level=os.getenv("BOT_LOG_LEVEL", "DEBUG"))
 
 # secrets = toml.load(os.path.join(os.path.dirname(__file__), "secrets.toml"))
 BASE_DIR = BASE_DIR = os.path.dirname(__file__)
 
-# twilio = Client(secrets["TWILIO_SID"], secrets["TWILIO_KEY"])
-twilio = Client()
-
 load_dotenv(override=True)
 
+# "cloud" uses Deepgram / Groq / Cartesia; "local" swaps in the stand-ins
+# from stand_ins.py so the bot can be benchmarked without API keys
+BOT_SERVICES = os.getenv("BOT_SERVICES", "cloud")
+
+
+def build_services():
+    """STT, LLM, TTS and VAD for one call"""
+    if BOT_SERVICES == "local":
+        from stand_ins import (
+            EnergyVADAnalyzer,
+            LocalLLMService,
+            LocalSTTService,
+            LocalTTSService,
+        )
+
+        return LocalSTTService(), LocalLLMService(), LocalTTSService(), EnergyVADAnalyzer()
+
+    from pipecat.services.cartesia import CartesiaTTSService
+    from pipecat.services.deepgram import DeepgramSTTService
+    from resources import SharedClientOpenAILLMService, SharedSileroVADAnalyzer
+
+    # Deepgram and Cartesia stream over a websocket per call; the LLM client
+    # and the VAD session are shared across calls
+    stt = DeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"))
+    llm = SharedClientOpenAILLMService(
+        name="groq",
+        api_key=os.getenv("GROQ_API_KEY"),
+        model="llama-3.3-70b-text-preview",
+        base_url="https://api.groq.com/openai/v1",
+    )
+
+    tts = CartesiaTTSService(
+        api_key=os.getenv("CARTESIA_API_KEY"),
+        voice_id="95856005-0332-41b0-935f-352e296aa0df",  # Classy British Man
+    )
+    return stt, llm, tts, SharedSileroVADAnalyzer()
+
 
 async def main(websocket_client, stream_sid):
     print("Running bot...")
+    stt, llm, tts, vad_analyzer = build_services()
+
     transport = FastAPIWebsocketTransport(
         websocket=websocket_client,
         params=FastAPIWebsocketParams(
             audio_out_enabled=True,
             add_wav_header=False,
             vad_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(),
+            vad_analyzer=vad_analyzer,
             vad_audio_passthrough=True,
             serializer=TwilioFrameSerializer(stream_sid),
         ),
     )
 
-    stt = DeepgramSTTService(api_key=secrets["DEEPGRAM_KEY"])
-    llm = OpenAILLMService(
-        name="groq",
-        api_key=secrets["GROQ_KEY"],
-        model="llama-3.3-70b-text-preview",
-        base_url="https://api.groq.com/openai/v1",
-    )
-
-    tts = CartesiaTTSService(
-        api_key=secrets["CARTESIA_KEY"],
-        voice_id="95856005-0332-41b0-935f-352e296aa0df",  # Classy British Man
-    )
-
     """with open(os.path.join(BASE_DIR, "templates", "voice_prompt.md")) as f:
         voice_prompt = f.read()"""
 
@@ -118,4 +134,10 @@ async def main(websocket_client, stream_sid):
 
     runner = PipelineRunner(handle_sigint=False)
 
-    await runner.run(task)
+    try:
+        await runner.run(task)
+    finally:
+        # A dropped websocket or server shutdown can end the run without an
+        # EndFrame; make sure the pipeline and its service connections stop
+        if not task.has_finished():
+            await task.cancel()
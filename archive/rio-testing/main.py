@@ -1,15 +1,36 @@
+import asyncio
+import functools
 import json
-import os, sys
+import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, WebSocket, Response
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import HTMLResponse
 
-from twilio.twiml.voice_response import VoiceResponse
+from bot import BOT_SERVICES, main
 
-from bot import main
+BASE_DIR = os.path.dirname(__file__)
 
-app = FastAPI()
+# Calls in progress by stream SID
+active_calls: dict[str, asyncio.Task] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if BOT_SERVICES != "local":
+        from resources import preload
+
+        # Blocking model load, done once before the first call arrives
+        await asyncio.to_thread(preload)
+    yield
+    # Hang up whatever is still connected on shutdown
+    for task in list(active_calls.values()):
+        task.cancel()
+    await asyncio.gather(*active_calls.values(), return_exceptions=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -21,21 +42,53 @@ app.add_middleware(
 )
 
 
+@functools.cache
+def streams_template() -> str:
+    with open(os.path.join(BASE_DIR, "templates", "streams.xml")) as f:
+        return f.read()
+
+
 @app.post("/twilio-webhook")
-def twilio_webhook():
+async def twilio_webhook(request: Request):
     print("Post TwiML...")
+    # Point the stream at whichever host Twilio reached us on
+    host = os.getenv("STREAM_HOST") or request.headers.get("host", "")
     return HTMLResponse(
-        content=open("templates/streams.xml").read(), media_type="application/xml"
+        content=streams_template().replace("{host}", host),
+        media_type="application/xml",
     )
 
 
+@app.get("/status")
+async def status():
+    return {"active_calls": len(active_calls)}
+
+
 @app.websocket("/ws")
 async def web_socket_connection(websocket: WebSocket):
     await websocket.accept()
     start_data = websocket.iter_text()
-    await start_data.__anext__()
-    call_data = json.loads(await start_data.__anext__())
+    try:
+        await start_data.__anext__()
+        call_data = json.loads(await start_data.__anext__())
+    except (StopAsyncIteration, WebSocketDisconnect):
+        return
     print(call_data, flush=True)
     stream_sid = call_data["start"]["streamSid"]
     print("Websocket connection accepted...")
-    await main(websocket, stream_sid)
+
+    task = asyncio.create_task(main(websocket, stream_sid))
+    active_calls[stream_sid] = task
+    try:
+        await task
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        # Drop the call's pipeline, services and buffers as soon as it ends
+        active_calls.pop(stream_sid, None)
+        try:
+            await websocket.close()
+        except RuntimeError:
+            # Already closed by the client
+            pass
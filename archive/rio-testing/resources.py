@@ -0,0 +1,73 @@
+"""Process-wide resources shared by every call the media-stream server handles.
+
+Building a SileroVADAnalyzer loads the onnx model into a fresh onnxruntime
+session, and every OpenAILLMService opens its own HTTP connection pool.
+Both used to happen once per call. Here the session and the pool are
+created once and each call only gets the small per-call state: the VAD's
+recurrent state and the pipeline objects.
+"""
+
+import copy
+import functools
+import os
+
+from loguru import logger
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.services.openai import OpenAILLMService
+
+# Keep-alive connections to the LLM endpoint shared by all calls
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero VAD whose onnxruntime session is loaded once per process.
+
+    The first instance loads the model; later ones take a shallow copy of
+    that model wrapper (same session) with freshly reset recurrent state,
+    so calls don't hear each other.
+    """
+
+    _template = None
+
+    def __init__(self, *, sample_rate: int | None = None, params: VADParams | None = None):
+        params = params or VADParams()
+        cls = type(self)
+        if cls._template is None:
+            super().__init__(sample_rate=sample_rate, params=params)
+            cls._template = self._model
+        else:
+            VADAnalyzer.__init__(self, sample_rate=sample_rate, num_channels=1, params=params)
+            self._last_reset_time = 0
+        self._model = copy.copy(cls._template)
+        self._model.reset_states()
+
+
+@functools.cache
+def shared_openai_client(api_key: str | None, base_url: str | None):
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    import httpx
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            )
+        ),
+    )
+
+
+class SharedClientOpenAILLMService(OpenAILLMService):
+    """OpenAILLMService that reuses one client (and connection pool) per endpoint"""
+
+    def create_client(self, api_key=None, base_url=None, **kwargs):
+        return shared_openai_client(api_key, base_url)
+
+
+def preload():
+    """Load the shared VAD model up front so the first call doesn't pay for it"""
+    logger.info("Preloading shared Silero VAD session")
+    SharedSileroVADAnalyzer()
@@ -0,0 +1,147 @@
+"""Local stand-ins for the bot's STT, LLM and TTS services.
+
+They behave like the real services as far as the pipeline can tell, but
+answer after a configurable latency (with jitter) instead of calling an
+API. That makes the pipeline itself (transport, VAD, aggregation,
+serialization) measurable without phones or paid keys. Latencies are
+configured in milliseconds through the environment:
+
+    STAND_IN_STT_MS               end of speech -> final transcription (150)
+    STAND_IN_LLM_FIRST_TOKEN_MS   context -> first token (350)
+    STAND_IN_LLM_TOKEN_MS         between tokens (15)
+    STAND_IN_TTS_MS               sentence -> first audio (120)
+    STAND_IN_JITTER               +/- fraction applied to each wait (0.2)
+"""
+
+import asyncio
+import itertools
+import os
+import random
+
+import numpy as np
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import (
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMMessagesFrame,
+    TextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.ai_services import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+
+def latency_ms(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+async def wait_ms(ms: float):
+    jitter = float(os.getenv("STAND_IN_JITTER", "0.2"))
+    await asyncio.sleep(max(0.0, ms * (1 + random.uniform(-jitter, jitter))) / 1000)
+
+
+USER_LINES = [
+    "Hi, I'm calling about my booking.",
+    "Can you move it to Thursday afternoon?",
+    "Great, and is parking included?",
+    "Thanks, that's everything.",
+]
+
+BOT_REPLY = (
+    "Sure, I can help with that. "
+    "Let me check what we have available and get back to you in a moment."
+)
+
+
+class EnergyVADAnalyzer(VADAnalyzer):
+    """Volume-threshold VAD, so the synthetic driver audio (which Silero
+    would not take for speech) still opens and closes user turns"""
+
+    def __init__(self, *, sample_rate: int | None = None, threshold: float = 0.02, params: VADParams | None = None):
+        super().__init__(sample_rate=sample_rate, num_channels=1, params=params or VADParams())
+        self._threshold = threshold
+
+    def num_frames_required(self) -> int:
+        # 20ms windows
+        return int(self.sample_rate * 0.02)
+
+    def voice_confidence(self, buffer) -> float:
+        samples = np.frombuffer(buffer, dtype=np.int16).astype(np.float32) / 32768.0
+        if samples.size == 0:
+            return 0.0
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        return min(1.0, rms / self._threshold)
+
+
+class LocalSTTService(FrameProcessor):
+    """Emits a canned final transcription some time after each user turn ends"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lines = itertools.cycle(USER_LINES)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        await self.push_frame(frame, direction)
+
+        if isinstance(frame, UserStoppedSpeakingFrame):
+            await wait_ms(latency_ms("STAND_IN_STT_MS", 150))
+            await self.push_frame(
+                TranscriptionFrame(next(self._lines), "", time_now_iso8601())
+            )
+
+
+class LocalLLMService(FrameProcessor):
+    """Streams a canned reply token by token for every context it is given"""
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if not isinstance(frame, (OpenAILLMContextFrame, LLMMessagesFrame)):
+            await self.push_frame(frame, direction)
+            return
+
+        await self.push_frame(LLMFullResponseStartFrame())
+        await wait_ms(latency_ms("STAND_IN_LLM_FIRST_TOKEN_MS", 350))
+        token_ms = latency_ms("STAND_IN_LLM_TOKEN_MS", 15)
+        for position, word in enumerate(BOT_REPLY.split(" ")):
+            if position:
+                await wait_ms(token_ms)
+            await self.push_frame(TextFrame(word if position == 0 else f" {word}"))
+        await self.push_frame(LLMFullResponseEndFrame())
+
+
+class LocalTTSService(TTSService):
+    """Synthesizes a quiet tone per sentence, about 60ms of audio per character"""
+
+    def __init__(self, *, audio_sample_rate: int = 16000, **kwargs):
+        super().__init__(**kwargs)
+        self._audio_sample_rate = audio_sample_rate
+
+    def can_generate_metrics(self) -> bool:
+        return True
+
+    async def run_tts(self, text: str):
+        await wait_ms(latency_ms("STAND_IN_TTS_MS", 120))
+        yield TTSStartedFrame()
+
+        rate = self._audio_sample_rate
+        seconds = min(8.0, 0.06 * len(text))
+        t = np.arange(int(rate * seconds)) / rate
+        tone = (0.1 * 32767 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+        # 100ms chunks, like a streaming TTS
+        chunk = rate // 10
+        for start in range(0, tone.size, chunk):
+            yield TTSAudioRawFrame(
+                audio=tone[start : start + chunk].tobytes(),
+                sample_rate=rate,
+                num_channels=1,
+            )
+        yield TTSStoppedFrame()
@@ -0,0 +1,178 @@
+import io
+import logging
+import os
+
+import numpy as np
+import requests
+from scipy import ndimage
+from scipy.io import wavfile
+
+logger = logging.getLogger(__name__)
+
+
+FRAME_MS = 20
+# Gaps shorter than this inside a turn are bridged; blips shorter than
+# MIN_SPEECH_MS are dropped
+HANGOVER_MS = 300
+MIN_SPEECH_MS = 100
+DEAD_AIR_SECONDS = float(os.getenv("AUDIO_DEAD_AIR_SECONDS", "2.0"))
+
+# Fixa dials from our Twilio number, so the caller is on the first channel and
+# the agent under test on the second. Vapi records the customer (the agent
+# under test in outbound runs) on the first channel.
+INBOUND_AGENT_CHANNEL = 1
+OUTBOUND_AGENT_CHANNEL = 0
+
+
+def audio_analysis_enabled() -> bool:
+    return os.getenv("AUDIO_ANALYSIS", "1") != "0"
+
+
+def load_recording(source: str) -> tuple[int, np.ndarray]:
+    """Read a WAV recording from a local path (memory-mapped) or a URL"""
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        rate, samples = wavfile.read(io.BytesIO(response.content))
+    else:
+        rate, samples = wavfile.read(source, mmap=True)
+
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    return rate, samples
+
+
+def frame_levels(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """Per-frame RMS level in dBFS, shape (frames, channels)"""
+    n_frames = samples.shape[0] // frame_len
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len, -1)
+    if np.issubdtype(samples.dtype, np.integer):
+        full_scale = float(np.iinfo(samples.dtype).max)
+    else:
+        full_scale = 1.0
+    # einsum accumulates in float64 without materialising a converted copy
+    power = np.einsum("ijk,ijk->ik", frames, frames, dtype=np.float64) / frame_len
+    return 10.0 * np.log10(power / full_scale**2 + 1e-12)
+
+
+def voice_activity(levels: np.ndarray) -> np.ndarray:
+    """Boolean speech mask per frame and channel from an adaptive energy threshold"""
+    noise_floor = np.percentile(levels, 10, axis=0)
+    threshold = np.maximum(noise_floor + 12.0, -50.0)
+    active = levels > threshold
+
+    close = np.ones((max(1, HANGOVER_MS // FRAME_MS), 1), dtype=bool)
+    opening = np.ones((max(1, MIN_SPEECH_MS // FRAME_MS), 1), dtype=bool)
+    active = ndimage.binary_closing(active, structure=close)
+    return ndimage.binary_opening(active, structure=opening)
+
+
+def segments(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) frame indices of each run of True"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def summarize(values: np.ndarray) -> dict:
+    if values.size == 0:
+        return {"count": 0}
+    p50, p90 = np.percentile(values, [50, 90])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def analyze_samples(rate: int, samples: np.ndarray, agent_channel: int) -> dict:
+    frame_len = max(1, rate * FRAME_MS // 1000)
+    frame_s = frame_len / rate
+    levels = frame_levels(samples, frame_len)
+    if levels.shape[0] == 0:
+        return {"duration_seconds": 0.0}
+
+    active = voice_activity(levels)
+    if active.shape[1] < 2:
+        # Mono recording: no way to tell the parties apart
+        return {
+            "duration_seconds": round(samples.shape[0] / rate, 3),
+            "speech_seconds": round(float(active[:, 0].sum() * frame_s), 3),
+        }
+
+    agent = active[:, agent_channel]
+    caller = active[:, 1 - agent_channel]
+    agent_starts, agent_ends = segments(agent)
+    caller_starts, caller_ends = segments(caller)
+
+    # Agent response latency: from each end of caller speech to the next agent
+    # onset, for turns where the agent was silent when the caller stopped
+    idx = np.searchsorted(agent_starts, caller_ends)
+    has_reply = idx < agent_starts.size
+    ends = caller_ends[has_reply]
+    replies = agent_starts[idx[has_reply]]
+    silent_at_end = ~agent[np.minimum(ends, agent.size - 1)]
+    latencies = (replies - ends)[silent_at_end] * frame_s
+
+    # Barge-ins: one side starts talking while the other is mid-turn
+    agent_barge_ins = int(caller[agent_starts].sum()) if agent_starts.size else 0
+    caller_barge_ins = int(agent[caller_starts].sum()) if caller_starts.size else 0
+
+    # Dead air: both sides silent for a long stretch inside the conversation
+    either = agent | caller
+    dead_air = []
+    speaking = np.flatnonzero(either)
+    if speaking.size:
+        inner = ~either[speaking[0] : speaking[-1] + 1]
+        silent_starts, silent_ends = segments(inner)
+        gaps = (silent_ends - silent_starts) * frame_s
+        dead_air = gaps[gaps >= DEAD_AIR_SECONDS]
+
+    return {
+        "duration_seconds": round(samples.shape[0] / rate, 3),
+        "agent": {
+            "speech_seconds": round(float(agent.sum() * frame_s), 3),
+            "turns": int(agent_starts.size),
+        },
+        "caller": {
+            "speech_seconds": round(float(caller.sum() * frame_s), 3),
+            "turns": int(caller_starts.size),
+        },
+        "response_latency": {
+            **summarize(latencies),
+            "per_turn": [round(float(value), 3) for value in latencies],
+        },
+        "overlap_seconds": round(float((agent & caller).sum() * frame_s), 3),
+        "barge_ins": {"agent": agent_barge_ins, "caller": caller_barge_ins},
+        "dead_air": {
+            "count": int(len(dead_air)),
+            "total_seconds": round(float(np.sum(dead_air)), 3),
+            "longest_seconds": round(float(np.max(dead_air)), 3) if len(dead_air) else 0.0,
+        },
+    }
+
+
+def analyze_recording(source: str, agent_channel: int) -> dict:
+    rate, samples = load_recording(source)
+    return analyze_samples(rate, samples, agent_channel)
+
+
+def attach_audio_metrics(result: dict, agent_channel: int, source: str | None = None) -> dict:
+    """Add audio metrics to a serialized TestResult's extra_data, if it has a
+    recording. `source` is a local copy to read instead of the URL."""
+    url = result.get("stereo_recording_url")
+    if not url or not result.get("evaluation_results"):
+        return result
+
+    try:
+        metrics = analyze_recording(source or url, agent_channel)
+    except Exception as e:
+        logger.error(f"Audio analysis failed for {url}: {e}")
+        metrics = {"error": str(e)}
+
+    evaluation_results = result["evaluation_results"]
+    if evaluation_results.get("extra_data") is None:
+        evaluation_results["extra_data"] = {}
+    evaluation_results["extra_data"]["audio"] = metrics
+    return result
@@ -0,0 +1,335 @@
+"""Run a JSONL file of TestRequests, several at a time, resumably.
+
+Each input line is a TestRequest body as POSTed to /runTests. Results are
+appended to the output JSONL one line per test, as each test finishes with
+--direct and when the server's run returns otherwise:
+
+    {"key": ..., "line": 3, "test_index": 0, "run_id": ..., "result": {TestResult}}
+
+Tests that produced a result without an error are recorded in a checkpoint
+file; running the same command again skips them and only dials the rest.
+A test that errored is re-run on resume, so a consumer should keep the last
+output line per (key, test_index).
+
+    python batch_runner.py queue.jsonl --out results.jsonl --parallel 4
+    python batch_runner.py queue.jsonl --out results.jsonl --direct
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SERVER = os.getenv("BATCH_SERVER_URL", "http://localhost:5001")
+# Upper bound on waiting out a 503 from admission control
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+def request_keys(lines):
+    """(key, line number, request) for each non-blank input line.
+
+    The key hashes the request itself, so it survives lines being added or
+    reordered; identical requests are told apart by occurrence.
+    """
+    seen = Counter()
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            logger.error(f"Skipping line {number}: {e}")
+            continue
+        digest = hashlib.sha256(
+            json.dumps(request, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        seen[digest] += 1
+        yield f"{digest}-{seen[digest]}", number, request
+
+
+class Checkpoint:
+    """Append-only record of finished tests: {"key": ..., "tests": [indices]} per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, set[int]] = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A write cut short by the interruption
+                        continue
+                    self.done.setdefault(entry["key"], set()).update(entry["tests"])
+        self._file = open(path, "a")
+
+    def remaining(self, key: str, n_tests: int) -> list[int]:
+        done = self.done.get(key, set())
+        return [i for i in range(n_tests) if i not in done]
+
+    def record(self, key: str, tests: list[int]):
+        if not tests:
+            return
+        self.done.setdefault(key, set()).update(tests)
+        self._file.write(json.dumps({"key": key, "tests": tests}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def report_outcome(outcome: dict, n_tests: int, on_result):
+    """Pass each test's result in a worker-style outcome to on_result(position,
+    result, run_id); a missing or short output errors every test"""
+    results = outcome.get("output")
+    if results is None or len(results) != n_tests:
+        error = outcome.get("error") or (
+            f"Expected {n_tests} results, got {len(results or [])}"
+        )
+        results = [{"error": error} for _ in range(n_tests)]
+    for position, result in enumerate(results):
+        on_result(position, result, outcome.get("run_id"))
+
+
+class ServerTarget:
+    """POSTs each request to server_v2's /runTests"""
+
+    def __init__(self, url: str):
+        import httpx
+
+        # Suites can take many minutes; only connecting is bounded
+        self.client = httpx.AsyncClient(
+            base_url=url, timeout=httpx.Timeout(None, connect=30)
+        )
+
+    async def run(self, request: dict, on_result):
+        while True:
+            response = await self.client.post("/runTests", json=request)
+            if response.status_code == 503:
+                retry_after = min(
+                    float(response.headers.get("retry-after", "5")),
+                    MAX_RETRY_AFTER_SECONDS,
+                )
+                logger.info(f"Server busy, retrying in {retry_after:.0f}s")
+                await asyncio.sleep(retry_after)
+                continue
+            body = response.json()
+            if body.get("error") and not body.get("result"):
+                outcome = {"error": body["error"], "run_id": body.get("run_id")}
+            else:
+                outcome = {"output": body.get("result") or [], "run_id": body.get("run_id")}
+            report_outcome(outcome, len(request["tests"]), on_result)
+            return
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class DirectTarget:
+    """Awaits the inbound/outbound worker coroutines in this process.
+
+    Like server_v2, each test runs as its own single-test request: the
+    outbound worker only handles one test per request, and a result can be
+    checkpointed as soon as its test finishes. At most `parallel` tests run
+    at once across all lines, as the server's line scheduler would allow.
+    """
+
+    def __init__(self, parallel: int):
+        from dotenv import load_dotenv
+
+        load_dotenv(override=True)
+        self.slots = asyncio.Semaphore(max(1, parallel))
+        # Outbound runs share the Vapi assistant and webhook port
+        self.outbound_lock = asyncio.Lock()
+
+    async def run(self, request: dict, on_result):
+        async def run_test(index: int, test: dict):
+            try:
+                async with self.slots:
+                    outcome = await self.run_single({**request, "tests": [test]})
+            except Exception as e:
+                logger.error(f"Test {index} failed: {str(e)}", exc_info=True)
+                outcome = {"error": str(e)}
+            report_outcome(
+                outcome, 1, lambda _, result, run_id: on_result(index, result, run_id)
+            )
+
+        await asyncio.gather(
+            *(run_test(index, test) for index, test in enumerate(request["tests"]))
+        )
+
+    async def run_single(self, request: dict) -> dict:
+        from ports import OUTBOUND_WEBHOOK_PORT, caller_numbers, inbound_ports
+
+        if request.get("agent_type") == "inbound":
+            import test_inbound
+
+            with caller_numbers.number() as caller_number:
+                async with inbound_ports.port() as port:
+                    return await test_inbound.run_tests(
+                        request, port=port, caller_number=caller_number
+                    )
+
+        import test_outbound
+
+        async with self.outbound_lock:
+            output = await test_outbound.run_tests(request, port=OUTBOUND_WEBHOOK_PORT)
+        return {"output": output} if isinstance(output, list) else output
+
+    async def close(self):
+        pass
+
+
+class BatchRunner:
+    def __init__(self, target, checkpoint: Checkpoint, out_path: str, parallel: int):
+        self.target = target
+        self.checkpoint = checkpoint
+        self.out = open(out_path, "a")
+        self.parallel = max(1, parallel)
+        self.counts = Counter()
+
+    def write(self, key: str, line: int, test_index: int, run_id: str | None, result: dict):
+        self.out.write(
+            json.dumps(
+                {
+                    "key": key,
+                    "line": line,
+                    "test_index": test_index,
+                    "run_id": run_id,
+                    "result": result,
+                }
+            )
+            + "\n"
+        )
+        self.out.flush()
+
+    async def run_one(self, key: str, line: int, request: dict):
+        tests = request.get("tests") or []
+        pending = self.checkpoint.remaining(key, len(tests))
+        self.counts["skipped"] += len(tests) - len(pending)
+        if not pending:
+            return
+
+        finished = []
+        reported = set()
+
+        def on_result(position: int, result: dict, run_id: str | None):
+            index = pending[position]
+            reported.add(position)
+            self.write(key, line, index, run_id, result)
+            if result.get("error"):
+                self.counts["errored"] += 1
+            else:
+                self.counts["completed"] += 1
+                finished.append(index)
+                # Checkpointed per test, so an interruption loses only calls in flight
+                self.checkpoint.record(key, [index])
+
+        # Only dial what the checkpoint doesn't have
+        subset = {**request, "tests": [tests[i] for i in pending]}
+        try:
+            await self.target.run(subset, on_result)
+        except Exception as e:
+            logger.error(f"Line {line} failed: {str(e)}", exc_info=True)
+            for position in range(len(pending)):
+                if position not in reported:
+                    on_result(position, {"error": str(e)}, None)
+
+        logger.info(
+            f"Line {line}: {len(finished)}/{len(pending)} tests done"
+            f" ({dict(self.counts)})"
+        )
+
+    async def run(self, lines) -> Counter:
+        """Stream requests to `parallel` workers; at most that many lines are read ahead"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.parallel)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    await self.run_one(*item)
+                finally:
+                    queue.task_done()
+
+        async def produce():
+            for item in request_keys(lines):
+                await queue.put(item)
+            for _ in range(self.parallel):
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(worker()) for _ in range(self.parallel)]
+        try:
+            # Fails fast if a worker dies, rather than blocking the producer
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.out.close()
+        return self.counts
+
+
+async def main_async(args) -> Counter:
+    target = DirectTarget(args.parallel) if args.direct else ServerTarget(args.server)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.out}.checkpoint")
+    runner = BatchRunner(target, checkpoint, args.out, args.parallel)
+    try:
+        with open(args.input) as lines:
+            return await runner.run(lines)
+    finally:
+        checkpoint.close()
+        await target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[1:]),
+    )
+    parser.add_argument("input", help="JSONL file, one TestRequest per line")
+    parser.add_argument("--out", required=True, help="results JSONL (appended to)")
+    parser.add_argument("--checkpoint", help="defaults to <out>.checkpoint")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=4,
+        help="requests in flight; with --direct, also tests in flight",
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--server", default=DEFAULT_SERVER, help="server_v2 base URL")
+    target.add_argument(
+        "--direct", action="store_true", help="run the worker code in this process"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        stream=sys.stderr,
+    )
+    start = time.monotonic()
+    try:
+        counts = asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        logger.info("Interrupted; run the same command again to resume")
+        sys.exit(130)
+    logger.info(f"Finished in {time.monotonic() - start:.0f}s: {dict(counts)}")
+
+
+if __name__ == "__main__":
+    main()
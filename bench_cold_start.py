@@ -0,0 +1,84 @@
+"""Cold-start benchmark for the worker entry points.
+
+Imports each worker module in a fresh interpreter several times and fails
+(exit code 1) when the median import time, net of bare interpreter startup,
+goes over the budget. Run from the repo root:
+
+    python bench_cold_start.py [--budget-ms 150] [--runs 7]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ["test_inbound", "test_outbound"]
+
+DEFAULT_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "150"))
+
+
+def time_python(code: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def slowest_imports(module: str, env: dict, top: int = 5) -> list[tuple[int, str]]:
+    """Top cumulative import times (us) reported by -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "0"}
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.abspath(__file__)), env.get("PYTHONPATH")])
+    )
+
+    # Warm the bytecode cache so we measure imports, not compilation
+    for module in ENTRY_POINTS:
+        time_python(f"import {module}", env)
+
+    baseline = statistics.median(time_python("pass", env) for _ in range(args.runs))
+
+    failed = False
+    for module in ENTRY_POINTS:
+        samples = [time_python(f"import {module}", env) for _ in range(args.runs)]
+        cost = statistics.median(samples) - baseline
+        status = "ok" if cost <= args.budget_ms else "OVER BUDGET"
+        print(f"{module}: {cost:.1f}ms (budget {args.budget_ms:.0f}ms) {status}")
+        if cost > args.budget_ms:
+            failed = True
+            for cumulative, name in slowest_imports(module, env):
+                print(f"    {cumulative / 1000:8.1f}ms  {name}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
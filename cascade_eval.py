@@ -0,0 +1,220 @@
+import logging
+import os
+import re
+import time
+
+from pydantic import BaseModel
+
+from cassette import interaction_key, replayable
+from rate_limiter import eval_limiter
+from transcript import AGENT_ROLE, CALLER_ROLE, CompactTranscript
+
+logger = logging.getLogger(__name__)
+
+
+RULES_TIER = "rules"
+
+# LLM tiers tried in order for criteria the local checks could not decide.
+# Every tier but the last may leave a criterion undecided.
+DEFAULT_MODEL_TIERS = ["gpt-4o-mini", "gpt-4o"]
+
+CHECK_ROLES = {
+    "agent": {AGENT_ROLE},
+    "user": {CALLER_ROLE},
+    "any": {AGENT_ROLE, CALLER_ROLE},
+}
+
+
+class EvalResult(BaseModel):
+    name: str
+    passed: bool
+    reason: str
+
+
+class EvalResults(BaseModel):
+    evaluation_results: list[EvalResult]
+
+
+class TieredEvalResult(BaseModel):
+    name: str
+    passed: bool
+    reason: str
+    confident: bool
+
+
+class TieredEvalResults(BaseModel):
+    evaluation_results: list[TieredEvalResult]
+
+
+def model_tiers() -> list[str]:
+    raw = os.getenv("EVAL_MODEL_TIERS")
+    if not raw:
+        return list(DEFAULT_MODEL_TIERS)
+    return [model.strip() for model in raw.split(",") if model.strip()]
+
+
+def normalize_evaluation(evaluation: dict) -> dict:
+    """Accept both request (eval_name) and fixa (name) shaped evaluations"""
+    return {
+        "name": evaluation.get("eval_name") or evaluation.get("name"),
+        "prompt": evaluation.get("eval_success_criteria") or evaluation.get("prompt"),
+        "checks": evaluation.get("checks") or [],
+    }
+
+
+def run_check(check: dict, transcript: CompactTranscript) -> str | None:
+    """Run one deterministic check; return "pass", "fail" or None to escalate"""
+    roles = CHECK_ROLES.get(check.get("role", "agent"), CHECK_ROLES["agent"])
+    turns = transcript.by_roles(roles)
+    check_type = check.get("type")
+
+    if check_type == "keyword":
+        keywords = [keyword.lower() for keyword in check.get("keywords", [])]
+        matched = any(
+            keyword in turn.content.lower() for turn in turns for keyword in keywords
+        )
+    elif check_type == "regex":
+        pattern = re.compile(check["pattern"], re.IGNORECASE)
+        matched = any(pattern.search(turn.content) for turn in turns)
+    elif check_type == "max_turns":
+        matched = len(turns) <= check["turns"]
+    elif check_type == "min_turns":
+        matched = len(turns) >= check["turns"]
+    else:
+        logger.warning(f"Unknown check type {check_type!r}, escalating")
+        return None
+
+    outcome = check.get("on_match", "pass") if matched else check.get("on_miss", "escalate")
+    return outcome if outcome in ("pass", "fail") else None
+
+
+def run_rules(evaluation: dict, transcript: CompactTranscript) -> dict | None:
+    """First decisive check wins; None when every check escalates"""
+    for check in evaluation["checks"]:
+        try:
+            outcome = run_check(check, transcript)
+        except (KeyError, re.error) as e:
+            logger.warning(f"Invalid check on {evaluation['name']}: {e}")
+            continue
+        if outcome:
+            return {
+                "name": evaluation["name"],
+                "passed": outcome == "pass",
+                "reason": f"Decided by local {check.get('type')} check",
+                "tier": RULES_TIER,
+            }
+    return None
+
+
+def build_eval_prompt(formatted_messages: str, evaluations: list[dict], allow_undecided: bool) -> str:
+    criteria = str([{"name": e["name"], "prompt": e["prompt"]} for e in evaluations])
+    prompt = f"""
+    You are an expert at evaluating phone calls conducted by AI. You will be given a transcript of a call between an AI and a user, along with evaluation criteria to evaluate if the AI passed each of the evaluation criteria.
+
+    Here is the transcrpt of the call, one turn per line ("A:" is the AI, "U:" is the user):
+    {formatted_messages}
+
+    Please evaluate if the AI passed each of the evaluation criteria in the provided list:
+    {criteria}
+
+    For each evaluation result, return the eval_name, passed status, and reason for the evaluation.
+    """
+    if allow_undecided:
+        prompt += """
+    Also return confident=false for any criterion you cannot decide with high confidence from the transcript.
+    """
+    return prompt
+
+
+def llm_evaluate(get_client, model: str, formatted_messages: str, evaluations: list[dict], allow_undecided: bool):
+    prompt = build_eval_prompt(formatted_messages, evaluations, allow_undecided)
+    response_format = TieredEvalResults if allow_undecided else EvalResults
+
+    def parse():
+        logger.info(f"Parsing evaluation prompt with {model}...")
+        completion = eval_limiter.call(
+            model,
+            prompt,
+            get_client().beta.chat.completions.parse,
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=response_format,
+        )
+        usage = getattr(completion, "usage", None)
+        tokens = getattr(usage, "total_tokens", 0) or 0
+        parsed = completion.choices[0].message.parsed.evaluation_results
+        return [result.model_dump() for result in parsed], tokens
+
+    raw_results, tokens = replayable(
+        "openai.parse", interaction_key(model, prompt, allow_undecided), parse
+    )
+    return response_format.model_validate({"evaluation_results": raw_results}).evaluation_results, tokens
+
+
+def cascade_evaluate(get_client, transcript: CompactTranscript, evaluations: list[dict]):
+    """Evaluate criteria tier by tier: local checks, then each LLM in model_tiers().
+
+    `get_client` returns the OpenAI client and is only called when an LLM
+    tier actually sends a request, so criteria the rules decide (or a
+    cassette replays) need no API key. Returns the evaluation results in
+    criteria order, each tagged with the tier that decided it, and per-tier
+    stats for extra_data.
+    """
+    evaluations = [normalize_evaluation(e) for e in evaluations]
+    decided: dict[str, dict] = {}
+    stats: dict[str, dict] = {}
+
+    start = time.monotonic()
+    for evaluation in evaluations:
+        result = run_rules(evaluation, transcript)
+        if result:
+            decided[evaluation["name"]] = result
+    stats[RULES_TIER] = {"decided": len(decided), "seconds": time.monotonic() - start}
+
+    tiers = model_tiers()
+    for position, model in enumerate(tiers):
+        pending = [e for e in evaluations if e["name"] not in decided]
+        if not pending:
+            break
+
+        formatted_messages = transcript.render_budgeted(
+            focus=" ".join(e["prompt"] or "" for e in pending)
+        )
+        final = position == len(tiers) - 1
+        start = time.monotonic()
+        raw_results, tokens = llm_evaluate(
+            get_client, model, formatted_messages, pending, not final
+        )
+        pending_names = {e["name"] for e in pending}
+        count = 0
+        for raw in raw_results:
+            if raw.name not in pending_names or raw.name in decided:
+                continue
+            if not final and not raw.confident:
+                continue
+            decided[raw.name] = {
+                "name": raw.name,
+                "passed": raw.passed,
+                "reason": raw.reason,
+                "tier": model,
+            }
+            count += 1
+        stats[model] = {
+            "decided": count,
+            "seconds": time.monotonic() - start,
+            "tokens": tokens,
+        }
+
+    results = [
+        decided.get(
+            e["name"],
+            {
+                "name": e["name"],
+                "passed": False,
+                "reason": "Not evaluated",
+                "tier": None,
+            },
+        )
+        for e in evaluations
+    ]
+    return results, {"tiers": stats}
@@ -0,0 +1,174 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+
+# CASSETTE_MODE=record appends every external interaction of a run (OpenAI
+# parse calls, Vapi PATCHes, webhook payloads, fixa call outcomes) to
+# CASSETTE_PATH; CASSETTE_MODE=replay serves them back instead of touching the
+# network. Replayed interactions take their recorded time multiplied by
+# CASSETTE_TIME_SCALE (1 = original timings, 0 = no waiting).
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Replay asked for an interaction the cassette does not hold"""
+
+
+class ReplayedError(RuntimeError):
+    """An exception that was raised when the interaction was recorded"""
+
+
+def interaction_key(*parts) -> str:
+    """Stable key for an interaction from the inputs that determine its outcome"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+class Cassette:
+    """JSONL file of recorded interactions, one {kind, key, seconds, ...} per line.
+
+    Replay matches on (kind, key); identical interactions are served in the
+    order they were recorded.
+    """
+
+    def __init__(self, path: str, mode: str, time_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self.lock = threading.Lock()
+        self._entries = None
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> dict:
+        with self.lock:
+            if self._entries is None:
+                entries = defaultdict(deque)
+                with open(self.path) as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[(entry["kind"], entry["key"])].append(entry)
+                self._entries = entries
+                logger.info(f"Loaded cassette {self.path}")
+            return self._entries
+
+    def _take(self, kind: str, key: str) -> dict:
+        entries = self._load()
+        with self.lock:
+            recorded = entries.get((kind, key))
+            if not recorded:
+                raise CassetteMiss(f"No recorded {kind} interaction for key {key}")
+            return recorded.popleft()
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # One write per line, so concurrent workers appending to the same
+            # cassette don't interleave
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def _record(self, kind: str, key: str, seconds: float, value=None, error=None):
+        entry = {"kind": kind, "key": key, "seconds": round(seconds, 4)}
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        else:
+            entry["value"] = value
+        self._append(entry)
+
+    def _replayed(self, entry: dict):
+        if "error" in entry:
+            raise ReplayedError(entry["error"])
+        return entry["value"]
+
+    def delay(self, seconds: float) -> float:
+        return max(0.0, seconds * self.time_scale)
+
+    def call(self, kind: str, key: str, fn, /, *args, **kwargs):
+        """Run a blocking interaction, or replay it. The result must be JSON-serializable."""
+        if self.replaying:
+            entry = self._take(kind, key)
+            time.sleep(self.delay(entry["seconds"]))
+            return self._replayed(entry)
+
+        start = time.monotonic()
+        try:
+            value = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(kind, key, time.monotonic() - start, error=e)
+            raise
+        self._record(kind, key, time.monotonic() - start, value=value)
+        return value
+
+    async def acall(self, kind: str, key: str, fn, /, *args, **kwargs):
+        """Async variant of call() for coroutine functions"""
+        if self.replaying:
+            entry = self._take(kind, key)
+            await asyncio.sleep(self.delay(entry["seconds"]))
+            return self._replayed(entry)
+
+        start = time.monotonic()
+        try:
+            value = await fn(*args, **kwargs)
+        except Exception as e:
+            self._record(kind, key, time.monotonic() - start, error=e)
+            raise
+        self._record(kind, key, time.monotonic() - start, value=value)
+        return value
+
+    def record_event(self, kind: str, key: str, value, at: float):
+        """Record something that happened to us, `at` seconds into the run"""
+        if self.mode == "record":
+            self._record(kind, key, at, value=value)
+
+    def events(self, kind: str, key: str) -> list[dict]:
+        """All recorded events for (kind, key), in order, consuming them"""
+        entries = self._load()
+        with self.lock:
+            recorded = entries.pop((kind, key), deque())
+        return list(recorded)
+
+
+@functools.cache
+def get_cassette() -> Cassette | None:
+    """The cassette configured by the environment, or None when recording is off"""
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode not in CASSETTE_MODES:
+        logger.error(f"Ignoring unknown CASSETTE_MODE {mode!r}")
+        return None
+    if mode == "off":
+        return None
+    return Cassette(
+        os.getenv("CASSETTE_PATH", "cassettes/cassette.jsonl"),
+        mode,
+        float(os.getenv("CASSETTE_TIME_SCALE", "1")),
+    )
+
+
+def replayable(kind: str, key: str, fn, /, *args, **kwargs):
+    """Call fn through the active cassette, if any"""
+    cassette = get_cassette()
+    if cassette is None:
+        return fn(*args, **kwargs)
+    return cassette.call(kind, key, fn, *args, **kwargs)
+
+
+async def areplayable(kind: str, key: str, fn, /, *args, **kwargs):
+    """Await fn through the active cassette, if any"""
+    cassette = get_cassette()
+    if cassette is None:
+        return await fn(*args, **kwargs)
+    return await cassette.acall(kind, key, fn, *args, **kwargs)
@@ -0,0 +1,94 @@
+import gzip
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; fall back to gzip
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+MINIMUM_SIZE = 1024
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted = {
+        token.split(";")[0].strip().lower() for token in accept_encoding.split(",")
+    }
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=5)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON/text responses with zstd or gzip.
+
+    Responses that already carry a Content-Encoding, partial content and
+    non-text bodies (recordings) pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers") or [])
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    message["status"] == 206
+                    or b"content-encoding" in response_headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+
+            payload = b"".join(body)
+            response_headers = [
+                (key, value)
+                for key, value in start_message.get("headers") or []
+                if key not in (b"content-length", b"vary")
+            ]
+            if len(payload) >= self.minimum_size:
+                payload = compress(payload, encoding)
+                response_headers.append((b"content-encoding", encoding.encode()))
+            response_headers.append((b"content-length", str(len(payload)).encode()))
+            response_headers.append((b"vary", b"Accept-Encoding"))
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": payload})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,198 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_store import RUNS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+DURATIONS_PATH = os.getenv("DURATIONS_PATH", os.path.join(RUNS_DIR, "durations.json"))
+# Guesses for scenarios we have never run, until some history exists
+DEFAULT_CALL_SECONDS = float(os.getenv("DEFAULT_CALL_SECONDS", "120"))
+DEFAULT_EVAL_SECONDS = float(os.getenv("DEFAULT_EVAL_SECONDS", "10"))
+# Weight of the newest observation in the moving average
+SMOOTHING = 0.3
+
+
+def fingerprint(agent_type: str, test: dict) -> str:
+    """Identity of a scenario for duration history: who is called, and how"""
+    key = json.dumps(
+        [
+            agent_type,
+            test["agent_name"],
+            test["agent_description"],
+            test["scenario_name"],
+            test["scenario_description"],
+        ]
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class DurationHistory:
+    """Moving averages of call and evaluation seconds per scenario fingerprint,
+    persisted as one small JSON file.
+
+    record() is called on the event loop, so the file is written on a
+    background thread; records that arrive while a write is queued are
+    saved by that same write.
+    """
+
+    def __init__(self, path: str = DURATIONS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        self._save_queued = False
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="durations")
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable duration history {path}: {e}")
+
+    def record(self, key: str, call_seconds: float, eval_seconds: float):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    "call": call_seconds,
+                    "eval": eval_seconds,
+                    "runs": 0,
+                }
+            else:
+                entry["call"] += SMOOTHING * (call_seconds - entry["call"])
+                entry["eval"] += SMOOTHING * (eval_seconds - entry["eval"])
+            entry["runs"] += 1
+            entry["updated_at"] = time.time()
+            if self._save_queued:
+                return
+            self._save_queued = True
+        self._executor.submit(self._save)
+
+    def _save(self):
+        with self.lock:
+            self._save_queued = False
+            data = json.dumps(self.entries)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            staged = f"{self.path}.part"
+            with open(staged, "w") as f:
+                f.write(data)
+            os.replace(staged, self.path)
+        except OSError as e:
+            logger.error(f"Failed to persist duration history: {e}")
+
+    def expected(self, key: str) -> tuple[float, float]:
+        """Expected (call, eval) seconds; unseen scenarios get the median of
+        everything we've seen"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry["call"], entry["eval"]
+            if not self.entries:
+                return DEFAULT_CALL_SECONDS, DEFAULT_EVAL_SECONDS
+            return (
+                statistics.median(e["call"] for e in self.entries.values()),
+                statistics.median(e["eval"] for e in self.entries.values()),
+            )
+
+
+def expected_test_seconds(history: DurationHistory, agent_type: str, test: dict) -> tuple[float, float]:
+    """Expected (line, eval) seconds for a request-shaped test.
+
+    Repeated trials are counted as min_trials calls run `concurrency` at a
+    time; the real number depends on how soon the verdict settles.
+    """
+    call, evaluation = history.expected(fingerprint(agent_type, test))
+    trials = test.get("trials")
+    if trials:
+        rounds = math.ceil(max(1, trials["min_trials"]) / max(1, trials["concurrency"]))
+        call *= rounds
+    return call, evaluation
+
+
+def longest_first(expected: list[tuple[float, float]]) -> list[int]:
+    """Test indices by expected line time plus evaluation, longest first.
+
+    Starting the long calls first (LPT) keeps one late long call from
+    running on alone after every other line has gone idle.
+    """
+    return sorted(range(len(expected)), key=lambda i: -sum(expected[i]))
+
+
+class SuiteProgress:
+    """Where each test of a running suite is, and when the suite should end"""
+
+    def __init__(self, expected: list[tuple[float, float]], order: list[int], lines: int):
+        self.expected = expected
+        self.order = order
+        self.lines = max(1, lines)
+        self.started_at = time.monotonic()
+        self.first_call: dict[int, float] = {}
+        self.last_call_end: dict[int, float] = {}
+        self.on_line: dict[int, int] = {}
+        self.done: set[int] = set()
+        self.initial_eta = self.eta_seconds()
+
+    def call_started(self, index: int):
+        self.first_call.setdefault(index, time.monotonic())
+        self.on_line[index] = self.on_line.get(index, 0) + 1
+
+    def call_ended(self, index: int):
+        self.on_line[index] -= 1
+        self.last_call_end[index] = time.monotonic()
+
+    def finished(self, index: int):
+        self.done.add(index)
+
+    def eta_seconds(self) -> float:
+        """Seconds until the last test should be graded.
+
+        Calls on the line hold a line until their expected end; queued
+        calls are placed, in dispatch order, on whichever line frees first;
+        each test then needs its evaluation time after its call.
+        """
+        now = time.monotonic()
+        busy_until = []
+        ends = [now]
+        for index in self.order:
+            if index in self.done:
+                continue
+            call, evaluation = self.expected[index]
+            if self.on_line.get(index):
+                call_end = max(now, self.first_call[index] + call)
+                busy_until.append(call_end)
+                ends.append(call_end + evaluation)
+            elif index in self.first_call:
+                # Being evaluated
+                ends.append(max(now, self.last_call_end[index] + evaluation))
+
+        lines = busy_until + [now] * max(0, self.lines - len(busy_until))
+        heapq.heapify(lines)
+        for index in self.order:
+            if index in self.done or index in self.first_call:
+                continue
+            call, evaluation = self.expected[index]
+            call_end = heapq.heappop(lines) + call
+            heapq.heappush(lines, call_end)
+            ends.append(call_end + evaluation)
+        return max(ends) - now
+
+    def status(self) -> dict:
+        return {
+            "tests": len(self.expected),
+            "done": len(self.done),
+            "on_line": sum(1 for n in self.on_line.values() if n),
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 1),
+            "eta_seconds": round(self.eta_seconds(), 1),
+            "estimated_total_seconds": round(self.initial_eta, 1),
+        }
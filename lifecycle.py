@@ -0,0 +1,26 @@
+import asyncio
+import logging
+import signal
+
+logger = logging.getLogger(__name__)
+
+
+async def run_until_terminated(coro):
+    """Run a worker coroutine, cancelling it on SIGTERM.
+
+    server_v2 terminates workers whose client went away or whose run was
+    aborted; cancelling (rather than dying) lets the worker's cleanup hang up
+    calls and release its ports and tunnels.
+    """
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+
+    def cancel():
+        logger.info("SIGTERM received, cancelling run")
+        task.cancel()
+
+    loop.add_signal_handler(signal.SIGTERM, cancel)
+    try:
+        return await coro
+    finally:
+        loop.remove_signal_handler(signal.SIGTERM)
@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# Results evaluated at once in the evaluation stage. LLM calls inside are
+# still paced by the shared eval limiter.
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "8"))
+
+
+@functools.cache
+def get_client():
+    from openai import OpenAI
+
+    # Retries on 429 are handled by the shared eval limiter
+    return OpenAI(max_retries=0)
+
+
+def checks_by_eval(tests: list[dict]) -> dict:
+    """Local checks from the request, keyed by (scenario name, eval name)"""
+    return {
+        (test["scenario_name"], e["eval_name"]): e.get("checks") or []
+        for test in tests
+        for e in test["evaluations"]
+    }
+
+
+def error_result(test: dict, error: str) -> dict:
+    """Serialized TestResult for a request-shaped test that produced no call"""
+    return {
+        "test": {
+            "agent": {
+                "name": test["agent_name"],
+                "prompt": test["agent_description"],
+                "voice_id": "",
+            },
+            "scenario": {
+                "name": test["scenario_name"],
+                "prompt": test["scenario_description"],
+                "evaluations": [
+                    {"name": e["eval_name"], "prompt": e["eval_success_criteria"]}
+                    for e in test["evaluations"]
+                ],
+            },
+        },
+        "evaluation_results": None,
+        "transcript": [],
+        "stereo_recording_url": None,
+        "error": error,
+    }
+
+
+def manual_evals(serial_result, checks_by_eval=None):
+    """Run the tiered evaluator over a serialized result's transcript"""
+    from cascade_eval import cascade_evaluate
+    from transcript import CompactTranscript
+
+    transcript = CompactTranscript.from_messages(serial_result["transcript"])
+
+    scenario_name = serial_result["test"]["scenario"]["name"]
+    checks_by_eval = checks_by_eval or {}
+    evaluations = [
+        {**e, "checks": checks_by_eval.get((scenario_name, e["name"]), [])}
+        for e in serial_result["test"]["scenario"]["evaluations"]
+    ]
+
+    return cascade_evaluate(get_client, transcript, evaluations)
+
+
+def fill_missing_evaluation(result: dict, checks_by_eval=None) -> dict:
+    """Evaluate a serialized result that nothing has evaluated yet"""
+    if result.get("evaluation_results"):
+        return result
+
+    messages = result["transcript"]
+    # Calls that never connected only carry the system prompt
+    if all(message["role"] == "system" for message in messages):
+        return result
+
+    logger.info(f"Evaluating {result['test']['scenario']['name']}")
+    eval_results, cascade_stats = manual_evals(result, checks_by_eval)
+
+    result["evaluation_results"] = {
+        "evaluation_results": eval_results,
+        "extra_data": {"cascade": cascade_stats},
+    }
+    return result
+
+
+def evaluate_result(result: dict, checks_by_eval: dict, agent_channel: int) -> dict:
+    """Blocking evaluation stage for one finished call: grading, then audio metrics"""
+    fill_missing_evaluation(result, checks_by_eval)
+
+    from audio_analysis import attach_audio_metrics, audio_analysis_enabled
+    from recording_store import recording_store
+
+    if audio_analysis_enabled():
+        # The store is already downloading it; reuse that copy when it's a WAV
+        attach_audio_metrics(result, agent_channel, recording_store.local_wav(result, 120))
+    return result
+
+
+class EvalStage:
+    """Second stage of the call → evaluate pipeline.
+
+    Each finished call is submitted on its own as soon as its transcript is
+    in, and graded on a worker thread while other calls are still on the
+    line, so a suite takes about max(call time, eval time) rather than
+    their sum.
+    """
+
+    def __init__(self, workers: int = EVAL_WORKERS):
+        self.workers = workers
+        self._semaphore = None
+
+    def _gate(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    async def evaluate(self, result: dict, checks_by_eval: dict, agent_channel: int) -> dict:
+        async with self._gate():
+            try:
+                return await asyncio.to_thread(
+                    evaluate_result, result, checks_by_eval, agent_channel
+                )
+            except Exception as e:
+                # One failed grading must not lose the suite's other calls
+                logger.error(f"Evaluation failed: {str(e)}", exc_info=True)
+                result["error"] = result.get("error") or f"Evaluation failed: {str(e)}"
+                return result
+
+    async def evaluate_all(self, results: list[dict], checks_by_eval: dict, agent_channel: int) -> list[dict]:
+        return list(
+            await asyncio.gather(
+                *[self.evaluate(r, checks_by_eval, agent_channel) for r in results]
+            )
+        )
+
+
+eval_stage = EvalStage()
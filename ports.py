@@ -0,0 +1,80 @@
+import asyncio
+import os
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+
+
+class PortPool:
+    """Hands out local ports to concurrent runs so their webhook servers don't collide"""
+
+    def __init__(self, base: int, count: int):
+        self.base = base
+        self.count = count
+        self._free = None
+
+    def _queue(self) -> asyncio.Queue:
+        # Created lazily so the queue binds to the running event loop
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for port in range(self.base, self.base + self.count):
+                self._free.put_nowait(port)
+        return self._free
+
+    @asynccontextmanager
+    async def ports(self, n: int = 1):
+        free = self._queue()
+        taken = []
+        try:
+            for _ in range(n):
+                taken.append(await free.get())
+            yield taken
+        finally:
+            for port in taken:
+                free.put_nowait(port)
+
+    @asynccontextmanager
+    async def port(self):
+        async with self.ports(1) as taken:
+            yield taken[0]
+
+
+# Inbound runs each need their own local port behind an ngrok tunnel. Outbound
+# runs always use 8765, which the Vapi assistant's webhook tunnel points at.
+inbound_ports = PortPool(
+    int(os.getenv("INBOUND_PORT_BASE", "8770")),
+    int(os.getenv("INBOUND_PORT_COUNT", "16")),
+)
+OUTBOUND_WEBHOOK_PORT = 8765
+
+
+def twilio_phone_numbers() -> list[str]:
+    """Our caller numbers: TWILIO_PHONE_NUMBERS (comma-separated) or TWILIO_PHONE_NUMBER"""
+    raw = os.getenv("TWILIO_PHONE_NUMBERS") or os.getenv("TWILIO_PHONE_NUMBER") or ""
+    return [number.strip() for number in raw.split(",") if number.strip()]
+
+
+class CallerNumbers:
+    """Spreads concurrent inbound runs over our Twilio numbers, least used first.
+
+    Numbers are shared rather than exclusive: with a single number every run
+    still dials from it, as before.
+    """
+
+    def __init__(self):
+        self.in_use = Counter()
+
+    @contextmanager
+    def number(self):
+        numbers = twilio_phone_numbers()
+        if not numbers:
+            yield None
+            return
+        chosen = min(numbers, key=lambda number: self.in_use[number])
+        self.in_use[chosen] += 1
+        try:
+            yield chosen
+        finally:
+            self.in_use[chosen] -= 1
+
+
+caller_numbers = CallerNumbers()
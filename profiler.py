@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# Sampling every 10ms keeps the overhead to a few percent of one core, low
+# enough to leave on for a single production request.
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000
+
+# Leaf frames of a thread that is waiting rather than running Python code.
+# These are counted as idle instead of filling the flame graph.
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("subprocess.py", "_communicate"),
+}
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for every Python thread in this process.
+
+    It cannot tell runs apart: in a server handling several at once, their
+    coroutines share the event loop thread, so a profile taken around one
+    run includes the others.
+
+    A background thread snapshots all stacks every `interval` seconds and
+    counts them in collapsed form ("thread;outer;...;leaf"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._labels: dict = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            self.samples += 1
+            leaf = frame.f_code
+            if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                self.idle_samples += 1
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.monotonic() - self.started
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 25) -> dict:
+        self_counts: Counter[str] = Counter()
+        total_counts: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        return {
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "top_self": self_counts.most_common(top),
+            "top_total": total_counts.most_common(top),
+        }
+
+    def save(self, directory: str, name: str):
+        """Write <name>.collapsed (flame graph input) and <name>.json (summary)"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.collapsed"), "w") as f:
+            f.write(self.collapsed())
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+@contextmanager
+def profiling(directory: str | None, name: str):
+    """Profile the enclosed block into `directory`; a no-op when directory is None"""
+    if not directory:
+        yield None
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            profiler.save(directory, name)
+            logger.info(f"Saved profile {name} to {directory}")
+        except OSError as e:
+            logger.error(f"Failed to save profile {name}: {e}")
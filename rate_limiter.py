@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+
+# Per-model quotas for evaluation traffic (requests and tokens per minute).
+# Override with EVAL_RATE_LIMITS='{"gpt-4o": {"rpm": 500, "tpm": 30000}}'
+DEFAULT_MODEL_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+
+# Rough allowance for the structured evaluation the model writes back
+COMPLETION_TOKEN_ALLOWANCE = 500
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting"""
+    return max(1, len(text) // 4)
+
+
+def load_model_limits() -> dict:
+    limits = {model: dict(quota) for model, quota in DEFAULT_MODEL_LIMITS.items()}
+    raw = os.getenv("EVAL_RATE_LIMITS")
+    if raw:
+        try:
+            for model, quota in json.loads(raw).items():
+                limits.setdefault(model, {}).update(quota)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Ignoring invalid EVAL_RATE_LIMITS: {e}")
+    return limits
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at `per_minute`"""
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` from the bucket and return the seconds to wait before using it"""
+        with self.lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Drain the bucket so nothing is granted for at least `seconds`"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    The limit halves on a 429 or a latency spike and grows by roughly one slot
+    per window of healthy completions. Threads wait on a threading.Condition
+    and coroutines on an asyncio.Condition per event loop; release() wakes
+    both.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease: float = 0.5,
+        latency_factor: float = 2.5,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.baseline_latency = None
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.async_conds = weakref.WeakKeyDictionary()
+
+    def try_acquire(self) -> bool:
+        with self.cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self.cond:
+            async_cond = self.async_conds.get(loop)
+            if async_cond is None:
+                async_cond = self.async_conds[loop] = asyncio.Condition()
+        async with async_cond:
+            await async_cond.wait_for(self.try_acquire)
+
+    def _notify_async(self):
+        """Wake coroutines waiting on any loop; release() may run on any thread"""
+
+        async def notify(async_cond):
+            async with async_cond:
+                async_cond.notify_all()
+
+        for loop, async_cond in list(self.async_conds.items()):
+            if not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(notify(async_cond), loop)
+
+    def release(self, latency: float | None = None, throttled: bool = False):
+        with self.cond:
+            self.in_flight -= 1
+            if throttled:
+                self._shrink()
+            elif latency is not None:
+                if self.baseline_latency is None:
+                    self.baseline_latency = latency
+                # Ignore sub-second jitter when the baseline is tiny
+                if (
+                    latency > self.baseline_latency * self.latency_factor
+                    and latency - self.baseline_latency > 1.0
+                ):
+                    logger.warning(
+                        f"Eval latency spike ({latency:.1f}s vs {self.baseline_latency:.1f}s baseline)"
+                    )
+                    self._shrink()
+                else:
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                self.baseline_latency = 0.9 * self.baseline_latency + 0.1 * latency
+            self.cond.notify_all()
+            self._notify_async()
+
+    def _shrink(self):
+        self.limit = max(self.minimum, self.limit * self.decrease)
+
+
+class ModelLimiter:
+    """Request bucket, token bucket and AIMD concurrency for one model"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AIMDLimiter()
+
+    def capacity_wait(self, tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def pause(self, seconds: float):
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Return the Retry-After delay for a throttling error, or None if it is not one.
+
+    A throttling error without a usable header returns 0 so the caller falls
+    back to exponential backoff.
+    """
+    if getattr(error, "status_code", None) != 429:
+        return None
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(
+                    0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()
+                )
+            except (TypeError, ValueError):
+                pass
+    return 0.0
+
+
+class EvalRateLimiter:
+    """Shared limiter for every evaluation LLM call in the process"""
+
+    def __init__(self, limits: dict | None = None, max_retries: int = 5):
+        self.limits = limits if limits is not None else load_model_limits()
+        self.max_retries = max_retries
+        self.models: dict[str, ModelLimiter] = {}
+        self.lock = threading.Lock()
+
+    def model(self, name: str) -> ModelLimiter:
+        with self.lock:
+            if name not in self.models:
+                quota = self.limits.get(name, DEFAULT_MODEL_LIMITS["gpt-4o"])
+                self.models[name] = ModelLimiter(quota["rpm"], quota["tpm"])
+            return self.models[name]
+
+    def _retry_delay(self, model: str, error: Exception, attempt: int) -> float | None:
+        retry_after = retry_after_seconds(error)
+        if retry_after is None or attempt >= self.max_retries:
+            return None
+        delay = retry_after or min(60.0, 2.0**attempt)
+        logger.warning(
+            f"{model} throttled, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})"
+        )
+        # Hold back every queued caller, not just this one
+        self.model(model).pause(delay)
+        return delay
+
+    def call(self, model: str, prompt: str, fn, /, *args, **kwargs):
+        """Run a blocking LLM call `fn(*args, **kwargs)` within the model's limits"""
+        limiter = self.model(model)
+        tokens = estimate_tokens(prompt) + COMPLETION_TOKEN_ALLOWANCE
+        attempt = 0
+        while True:
+            time.sleep(limiter.capacity_wait(tokens))
+            limiter.concurrency.acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                limiter.concurrency.release(throttled=retry_after_seconds(e) is not None)
+                if self._retry_delay(model, e, attempt) is None:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.concurrency.release()
+                raise
+            limiter.concurrency.release(latency=time.monotonic() - start)
+            return result
+
+    async def acall(self, model: str, prompt: str, fn, /, *args, **kwargs):
+        """Await an async LLM call `fn(*args, **kwargs)` within the model's limits"""
+        limiter = self.model(model)
+        tokens = estimate_tokens(prompt) + COMPLETION_TOKEN_ALLOWANCE
+        attempt = 0
+        while True:
+            await asyncio.sleep(limiter.capacity_wait(tokens))
+            await limiter.concurrency.acquire_async()
+            start = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                limiter.concurrency.release(throttled=retry_after_seconds(e) is not None)
+                if self._retry_delay(model, e, attempt) is None:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                limiter.concurrency.release()
+                raise
+            limiter.concurrency.release(latency=time.monotonic() - start)
+            return result
+
+
+eval_limiter = EvalRateLimiter()
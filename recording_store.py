@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
+# Recordings downloaded at once, in the background
+RECORDING_DOWNLOAD_WORKERS = int(os.getenv("RECORDING_DOWNLOAD_WORKERS", "4"))
+# Re-encode stored recordings with ffmpeg ("opus", "mp3", "flac"); empty keeps
+# the original WAV. Skipped with a warning when ffmpeg is not on PATH.
+RECORDING_TRANSCODE = os.getenv("RECORDING_TRANSCODE", "")
+CHUNK_SIZE = 64 * 1024
+
+# codec -> (file extension, content type, ffmpeg output options)
+TRANSCODE_FORMATS = {
+    "opus": ("ogg", "audio/ogg", ["-c:a", "libopus", "-b:a", "32k"]),
+    "mp3": ("mp3", "audio/mpeg", ["-c:a", "libmp3lame", "-q:a", "5"]),
+    "flac": ("flac", "audio/flac", ["-c:a", "flac"]),
+}
+
+
+def recording_id(url: str) -> str:
+    """Stable id for a recording URL, used in results and the serving path"""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Inclusive byte range from a single-range Range header, None for the
+    whole file. Raises ValueError when the range can't be satisfied."""
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        # Multipart ranges aren't worth supporting for audio seeking
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f"Invalid range {header!r}")
+    if start >= size or end < start:
+        raise ValueError(f"Unsatisfiable range {header!r} for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def read_range(path: str, start: int, end: int):
+    """Yield the bytes start..end (inclusive) of a file in chunks"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+class RecordingStore:
+    """Local, content-addressed copies of call recordings.
+
+    Recordings are fetched on a small thread pool as results come in, so
+    they are on disk before the provider's URL expires. Files are named by
+    the SHA-256 of the downloaded bytes (objects/ab/abcd....wav), so the
+    same audio behind several URLs is stored once; refs/<recording id>.json
+    maps each URL to its object.
+    """
+
+    def __init__(
+        self,
+        root: str = RECORDINGS_DIR,
+        workers: int = RECORDING_DOWNLOAD_WORKERS,
+        transcode: str = RECORDING_TRANSCODE,
+    ):
+        self.root = root
+        self.transcode = transcode if transcode in TRANSCODE_FORMATS else ""
+        if transcode and not self.transcode:
+            logger.warning(f"Unknown RECORDING_TRANSCODE {transcode!r}, storing originals")
+        if self.transcode and shutil.which("ffmpeg") is None:
+            logger.warning("ffmpeg not found, storing recordings untranscoded")
+            self.transcode = ""
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="recording")
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", f"{key}.json")
+
+    def lookup(self, key: str) -> dict | None:
+        """Stored object for a recording id, if it has been downloaded"""
+        if not key.isalnum():
+            return None
+        try:
+            with open(self._ref_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pending(self, key: str) -> Future | None:
+        with self._lock:
+            return self._inflight.get(key)
+
+    def submit(self, url: str) -> str:
+        """Start downloading a recording unless we have it; returns its id"""
+        key = recording_id(url)
+        with self._lock:
+            if key in self._inflight or os.path.isfile(self._ref_path(key)):
+                return key
+            future = self._executor.submit(self._fetch, key, url)
+            self._inflight[key] = future
+
+        def done(future: Future):
+            with self._lock:
+                self._inflight.pop(key, None)
+            if future.exception():
+                logger.error(f"Failed to store recording {url}: {future.exception()}")
+
+        future.add_done_callback(done)
+        return key
+
+    def wait(self, key: str, timeout: float | None = None) -> dict | None:
+        """Stored object for a recording id, waiting for its download if in flight"""
+        future = self.pending(key)
+        if future is not None:
+            try:
+                return future.result(timeout)
+            except Exception:
+                return None
+        return self.lookup(key)
+
+    def attach(self, result: dict) -> dict:
+        """Queue a serialized TestResult's recording and note its id on the result"""
+        url = result.get("stereo_recording_url")
+        if url and url.startswith(("http://", "https://")):
+            result["recording_id"] = self.submit(url)
+        return result
+
+    def local_wav(self, result: dict, timeout: float | None = None) -> str | None:
+        """Path of a result's stored recording if it is kept as WAV"""
+        key = result.get("recording_id")
+        stored = self.wait(key, timeout) if key else None
+        if stored and stored["content_type"] == "audio/wav":
+            return os.path.join(self.root, stored["path"])
+        return None
+
+    def _fetch(self, key: str, url: str) -> dict:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            try:
+                with requests.get(url, stream=True, timeout=60) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        tmp.write(chunk)
+                        size += len(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        try:
+            stored = self._store_object(tmp.name, digest.hexdigest())
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        stored = {**stored, "url": url, "source_size": size}
+        self._write_json(self._ref_path(key), stored)
+        logger.info(f"Stored recording {key} as {stored['path']} ({stored['size']} bytes)")
+        return stored
+
+    def _store_object(self, source: str, sha256: str, transcode: str | None = None) -> dict:
+        """Move a downloaded file into place under its content hash, once"""
+        transcode = self.transcode if transcode is None else transcode
+        extension, content_type, options = "wav", "audio/wav", None
+        if transcode:
+            extension, content_type, options = TRANSCODE_FORMATS[transcode]
+        relative = os.path.join("objects", sha256[:2], f"{sha256}.{extension}")
+        path = os.path.join(self.root, relative)
+
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staged = f"{path}.{threading.get_ident()}.part"
+            if options is None:
+                os.replace(source, staged)
+            else:
+                try:
+                    subprocess.run(
+                        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source,
+                         *options, "-f", extension, staged],
+                        check=True,
+                        capture_output=True,
+                        timeout=300,
+                    )
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f"Transcoding {sha256} failed, keeping the WAV: {e}")
+                    return self._store_object(source, sha256, transcode="")
+            os.replace(staged, path)
+
+        return {
+            "sha256": sha256,
+            "path": relative,
+            "content_type": content_type,
+            "size": os.path.getsize(path),
+        }
+
+    def _write_json(self, path: str, data: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staged = f"{path}.{threading.get_ident()}.part"
+        with open(staged, "w") as f:
+            json.dump(data, f)
+        os.replace(staged, path)
+
+
+recording_store = RecordingStore()
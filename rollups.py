@@ -0,0 +1,261 @@
+import argparse
+import functools
+import glob
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_store import RUNS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUPS_PATH = os.getenv("ROLLUPS_PATH", os.path.join(RUNS_DIR, "rollups.sqlite"))
+GRANULARITIES = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+# Most buckets one trends query may span
+MAX_BUCKETS = 1000
+# Bumped when what add() counts changes; older databases are rebuilt from runs
+SCHEMA_VERSION = 2
+# Stands for "every agent" / "every scenario"; "" as eval_name is the whole test
+ALL = "*"
+TEST = ""
+
+# Durations go into log-spaced bins 5% wide from 10ms up, so percentiles
+# are exact to within a bin whatever the number of results
+HISTOGRAM_MIN_SECONDS = 0.01
+HISTOGRAM_GROWTH = 1.05
+PERCENTILES = (50, 90, 99)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    granularity TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    eval_name TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    results INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    errored INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, agent, scenario, eval_name, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS histograms (
+    granularity TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, agent, scenario, metric, bucket, bin)
+) WITHOUT ROWID;
+"""
+
+
+def histogram_bin(seconds: float) -> int:
+    seconds = max(seconds, HISTOGRAM_MIN_SECONDS)
+    return int(math.log(seconds / HISTOGRAM_MIN_SECONDS, HISTOGRAM_GROWTH))
+
+
+def bin_value(index: int) -> float:
+    """Geometric midpoint of a bin"""
+    return HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** (index + 0.5)
+
+
+def histogram_percentiles(bins: list[tuple[int, int]]) -> dict:
+    """p50/p90/p99 from sorted (bin, count) pairs"""
+    total = sum(count for _, count in bins)
+    if not total:
+        return {"n": 0}
+    out = {"n": total}
+    for p in PERCENTILES:
+        rank = math.ceil(total * p / 100)
+        seen = 0
+        for index, count in bins:
+            seen += count
+            if seen >= rank:
+                out[f"p{p}"] = round(bin_value(index), 3)
+                break
+    return out
+
+
+def result_metrics(result: dict, wall_seconds: float | None) -> dict[str, list[float]]:
+    """Duration and per-turn response latencies of one serialized TestResult.
+
+    The duration is the analysed recording's length, else the measured time
+    the call held a line.
+    """
+    extra_data = (result.get("evaluation_results") or {}).get("extra_data") or {}
+    audio = extra_data.get("audio") or {}
+    duration = audio.get("duration_seconds") or wall_seconds or result.get("call_seconds")
+    return {
+        "duration": [duration] if duration else [],
+        "latency": list((audio.get("response_latency") or {}).get("per_turn") or []),
+    }
+
+
+class Rollups:
+    """Pass counts and duration/latency histograms per time bucket, kept
+    up to date one result at a time.
+
+    Every result is added under its own agent and scenario and under the
+    ALL wildcard for each, so a trends query reads one row per bucket
+    (plus its histogram bins) however many results are behind it.
+    """
+
+    def __init__(self, path: str = ROLLUPS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="rollups")
+
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # Version 1 counted evaluation passes on errored results
+            if self._db.execute("SELECT 1 FROM counts LIMIT 1").fetchone():
+                logger.info(f"Rebuilding version {version} rollups from stored runs")
+                self.rebuild()
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def submit(self, result: dict, wall_seconds: float | None = None, at: float | None = None):
+        """Add a result in the background"""
+        at = time.time() if at is None else at
+        future = self._executor.submit(self.add, result, wall_seconds, at)
+        future.add_done_callback(
+            lambda f: f.exception() and logger.error(f"Failed to roll up result: {f.exception()}")
+        )
+
+    def add(self, result: dict, wall_seconds: float | None = None, at: float | None = None):
+        at = time.time() if at is None else at
+        test = result.get("test") or {}
+        agent = (test.get("agent") or {}).get("name") or ""
+        scenario = (test.get("scenario") or {}).get("name") or ""
+        evaluations = (result.get("evaluation_results") or {}).get("evaluation_results") or []
+        errored = bool(result.get("error")) or not evaluations
+
+        # An errored result counts as errored in every row, never as a pass,
+        # so passed never exceeds the graded results - errored
+        outcomes = [(TEST, all(e["passed"] for e in evaluations))]
+        outcomes += [(e["name"], e["passed"]) for e in evaluations]
+        outcomes = [(name, passed and not errored) for name, passed in outcomes]
+        metrics = result_metrics(result, wall_seconds)
+        keys = [(agent, scenario), (agent, ALL), (ALL, scenario), (ALL, ALL)]
+
+        counts = []
+        bins = []
+        for granularity, width in GRANULARITIES.items():
+            bucket = int(at // width * width)
+            for a, s in keys:
+                for eval_name, passed in outcomes:
+                    counts.append(
+                        (granularity, a, s, eval_name, bucket, int(passed), int(errored))
+                    )
+                for metric, values in metrics.items():
+                    for value in values:
+                        bins.append((granularity, a, s, metric, bucket, histogram_bin(value)))
+
+        with self._lock, self._db as db:
+            db.executemany(
+                "INSERT INTO counts VALUES (?, ?, ?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT DO UPDATE SET results = results + 1,"
+                " passed = passed + excluded.passed, errored = errored + excluded.errored",
+                counts,
+            )
+            db.executemany(
+                "INSERT INTO histograms VALUES (?, ?, ?, ?, ?, ?, 1)"
+                " ON CONFLICT DO UPDATE SET count = count + 1",
+                bins,
+            )
+
+    def trends(
+        self,
+        agent: str = ALL,
+        scenario: str = ALL,
+        eval_name: str = TEST,
+        granularity: str = "day",
+        since: float | None = None,
+        until: float | None = None,
+    ) -> list[dict]:
+        """One point per bucket in [since, until) that has results"""
+        width = GRANULARITIES[granularity]
+        until = time.time() if until is None else until
+        if since is None:
+            since = until - 30 * width
+        since = max(since, until - MAX_BUCKETS * width)
+        key = (granularity, agent, scenario)
+        bounds = (since // width * width, until)
+
+        with self._lock:
+            count_rows = self._db.execute(
+                "SELECT bucket, results, passed, errored FROM counts"
+                " WHERE granularity = ? AND agent = ? AND scenario = ? AND eval_name = ?"
+                " AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (*key, eval_name, *bounds),
+            ).fetchall()
+            bin_rows = self._db.execute(
+                "SELECT metric, bucket, bin, count FROM histograms"
+                " WHERE granularity = ? AND agent = ? AND scenario = ?"
+                " AND bucket >= ? AND bucket < ? ORDER BY metric, bucket, bin",
+                (*key, *bounds),
+            ).fetchall()
+
+        histograms: dict[tuple[str, int], list] = {}
+        for metric, bucket, index, count in bin_rows:
+            histograms.setdefault((metric, bucket), []).append((index, count))
+
+        points = []
+        for bucket, results, passed, errored in count_rows:
+            graded = results - errored
+            points.append(
+                {
+                    "bucket": bucket,
+                    "results": results,
+                    "passed": passed,
+                    "errored": errored,
+                    "pass_rate": round(passed / graded, 4) if graded else None,
+                    "duration_seconds": histogram_percentiles(histograms.get(("duration", bucket), [])),
+                    "latency_seconds": histogram_percentiles(histograms.get(("latency", bucket), [])),
+                }
+            )
+        return points
+
+    def rebuild(self, runs_dir: str = RUNS_DIR) -> int:
+        """Recompute every rollup from persisted runs"""
+        with self._lock, self._db as db:
+            db.execute("DELETE FROM counts")
+            db.execute("DELETE FROM histograms")
+        count = 0
+        for path in sorted(glob.glob(os.path.join(runs_dir, "*", "results.json"))):
+            try:
+                with open(path) as f:
+                    run = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping {path}: {e}")
+                continue
+            at = run.get("created_at") or os.path.getmtime(path)
+            for result in run["result"]:
+                self.add(result, at=at)
+                count += 1
+        return count
+
+
+@functools.cache
+def get_rollups() -> Rollups:
+    return Rollups()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild pass-rate rollups from stored runs")
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    rollups = get_rollups()
+    print(f"Rolled up {rollups.rebuild(args.runs_dir)} results into {rollups.path}")
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+RUNS_DIR = os.getenv("RUNS_DIR", "runs")
+# Recently finished runs kept in memory for paging without a disk read
+CACHE_SIZE = int(os.getenv("RUNS_CACHE_SIZE", "32"))
+
+# Named field selections for clients that only need part of each TestResult
+FIELD_PRESETS = {
+    "verdicts": [
+        "test.agent.name",
+        "test.scenario.name",
+        "evaluation_results.evaluation_results",
+        "error",
+    ],
+    "summary": [
+        "test.agent.name",
+        "test.scenario.name",
+        "evaluation_results.evaluation_results.name",
+        "evaluation_results.evaluation_results.passed",
+        "error",
+    ],
+}
+
+# Client-chosen run ids become directory names
+RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_cache: OrderedDict[str, dict] = OrderedDict()
+_lock = threading.Lock()
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_run_id(run_id: str) -> bool:
+    return bool(RUN_ID_PATTERN.match(run_id or ""))
+
+
+def run_path(run_id: str) -> str:
+    """Directory of a run; raises ValueError for ids that could escape RUNS_DIR"""
+    if not valid_run_id(run_id):
+        raise ValueError(f"Invalid run_id {run_id!r}")
+    root = os.path.realpath(RUNS_DIR)
+    path = os.path.realpath(os.path.join(root, run_id))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Invalid run_id {run_id!r}")
+    return path
+
+
+def run_dir(run_id: str) -> str:
+    path = run_path(run_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _remember(run_id: str, run: dict):
+    with _lock:
+        _cache[run_id] = run
+        _cache.move_to_end(run_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def save_run(run_id: str, results: list[dict], error: str | None = None) -> dict:
+    run = {"run_id": run_id, "result": results, "error": error, "created_at": time.time()}
+    _remember(run_id, run)
+    try:
+        with open(os.path.join(run_dir(run_id), "results.json"), "w") as f:
+            json.dump(run, f)
+    except OSError as e:
+        logger.error(f"Failed to persist run {run_id}: {e}")
+    return run
+
+
+def load_run(run_id: str) -> dict | None:
+    if not valid_run_id(run_id):
+        return None
+    with _lock:
+        if run_id in _cache:
+            _cache.move_to_end(run_id)
+            return _cache[run_id]
+
+    path = os.path.join(run_path(run_id), "results.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        run = json.load(f)
+    _remember(run_id, run)
+    return run
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """Split a comma-separated field selection, expanding presets"""
+    if not fields:
+        return None
+    paths = []
+    for field in fields.split(","):
+        field = field.strip()
+        if field:
+            paths.extend(FIELD_PRESETS.get(field, [field]))
+    return paths or None
+
+
+def _project(value, parts: list[str], out: dict):
+    head, rest = parts[0], parts[1:]
+    if head not in value:
+        return
+    if not rest:
+        out[head] = value[head]
+        return
+
+    child = value[head]
+    if isinstance(child, list):
+        items = out.get(head)
+        if not isinstance(items, list):
+            items = out[head] = [{} for _ in child]
+        for item, item_out in zip(child, items):
+            if isinstance(item, dict):
+                _project(item, rest, item_out)
+    elif isinstance(child, dict):
+        nested = out.get(head)
+        if not isinstance(nested, dict):
+            nested = out[head] = {}
+        _project(child, rest, nested)
+    else:
+        out[head] = child
+
+
+def project(result: dict, paths: list[str]) -> dict:
+    """Keep only the dotted `paths` of a serialized TestResult; lists are mapped over"""
+    out: dict = {}
+    for path in paths:
+        _project(result, path.split("."), out)
+    return out
+
+
+def page(run: dict, fields: str | None = None, offset: int = 0, limit: int | None = None) -> dict:
+    """Slice and project a stored run into a results response body.
+
+    `limit` must be at least 1 (the endpoints reject smaller ones), so
+    next_offset always moves forward.
+    """
+    results = run["result"]
+    total = len(results)
+    offset = max(0, offset)
+    end = total if limit is None else min(total, offset + max(1, limit))
+    selected = results[offset:end]
+
+    paths = parse_fields(fields)
+    if paths:
+        selected = [project(result, paths) for result in selected]
+
+    return {
+        "result": selected,
+        "error": run.get("error"),
+        "run_id": run["run_id"],
+        "total": total,
+        "offset": offset,
+        "next_offset": end if end < total else None,
+    }
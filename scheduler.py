@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from admission import PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TENANT = "default"
+
+
+def load_tenant_config(name: str) -> dict:
+    """Per-tenant numbers from a JSON env var, e.g. TENANT_WEIGHTS='{"search": 3}'"""
+    raw = os.getenv(name)
+    if not raw:
+        return {}
+    try:
+        return {tenant: float(value) for tenant, value in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Ignoring invalid {name}: {e}")
+        return {}
+
+
+class FairScheduler:
+    """Weighted fair queueing of per-test jobs across tenants.
+
+    Start-time fair queueing: each job is tagged with a virtual start time of
+    max(virtual clock, tenant's previous finish tag) and a finish tag
+    `cost / weight` later; free slots go to the eligible job with the smallest
+    start tag. A tenant that submits 2,000 tests at once only gets its
+    weighted share of slots while anyone else is waiting, and no more than
+    its concurrency cap at any time.
+
+    Interactive jobs are dispatched before any bulk job, whatever their
+    tags; the fair share applies within each priority class.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        weights: dict | None = None,
+        caps: dict | None = None,
+        default_weight: float = 1.0,
+        default_cap: int | None = None,
+    ):
+        self.slots = slots
+        self.weights = weights or {}
+        self.caps = caps or {}
+        self.default_weight = default_weight
+        self.default_cap = default_cap
+        self.virtual_time = 0.0
+        self.finish_tags: dict[str, float] = {}
+        self.running: dict[str, int] = {}
+        self.waiting: list = []
+        self.sequence = itertools.count()
+        self.busy = 0
+
+    def weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, self.default_weight), 1e-6)
+
+    def cap(self, tenant: str) -> int:
+        cap = self.caps.get(tenant, self.default_cap)
+        return self.slots if cap is None else max(1, int(cap))
+
+    def _eligible(self, tenant: str) -> bool:
+        return self.running.get(tenant, 0) < self.cap(tenant)
+
+    def _dispatch(self):
+        self.waiting = [job for job in self.waiting if not job[4].done()]
+        while self.busy < self.slots:
+            candidates = [job for job in self.waiting if self._eligible(job[3])]
+            if not candidates:
+                return
+            job = min(candidates)
+            self.waiting.remove(job)
+            _, start_tag, _, tenant, future = job
+            self.virtual_time = max(self.virtual_time, start_tag)
+            self.busy += 1
+            self.running[tenant] = self.running.get(tenant, 0) + 1
+            future.set_result(None)
+
+    def _release(self, tenant: str):
+        self.busy -= 1
+        self.running[tenant] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, cost: float = 1.0, priority: str = "bulk"):
+        """Wait for a line/worker slot on behalf of `tenant`"""
+        start_tag = max(self.virtual_time, self.finish_tags.get(tenant, 0.0))
+        self.finish_tags[tenant] = start_tag + cost / self.weight(tenant)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append(
+            (PRIORITIES[priority], start_tag, next(self.sequence), tenant, future)
+        )
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(tenant)
+            future.cancel()
+            self._dispatch()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def status(self) -> dict:
+        queued: dict[str, int] = {}
+        for *_, tenant, future in self.waiting:
+            if not future.done():
+                queued[tenant] = queued.get(tenant, 0) + 1
+        return {
+            "slots": self.slots,
+            "busy": self.busy,
+            "running": {tenant: n for tenant, n in self.running.items() if n},
+            "queued": queued,
+        }
+
+
+class UsageLedger:
+    """Per-tenant usage totals: runs, tests, calls, call minutes and LLM tokens"""
+
+    def __init__(self):
+        self.usage: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def _tenant(self, tenant: str) -> dict:
+        return self.usage.setdefault(
+            tenant,
+            {"runs": 0, "tests": 0, "calls": 0, "call_minutes": 0.0, "llm_tokens": 0},
+        )
+
+    def record_run(self, tenant: str):
+        with self.lock:
+            self._tenant(tenant)["runs"] += 1
+
+    def record_result(self, tenant: str, result: dict, wall_seconds: float):
+        """Account one finished test from its serialized TestResult"""
+        transcript = result.get("transcript") or []
+        placed_call = any(message.get("role") != "system" for message in transcript)
+        extra_data = (result.get("evaluation_results") or {}).get("extra_data") or {}
+
+        # Prefer the recording length; fall back to how long the test held a line
+        seconds = (extra_data.get("audio") or {}).get("duration_seconds") or wall_seconds
+        tokens = sum(
+            tier.get("tokens", 0)
+            for tier in ((extra_data.get("cascade") or {}).get("tiers") or {}).values()
+        )
+
+        with self.lock:
+            usage = self._tenant(tenant)
+            usage["tests"] += 1
+            if placed_call:
+                usage["calls"] += 1
+                usage["call_minutes"] = round(usage["call_minutes"] + seconds / 60.0, 3)
+            usage["llm_tokens"] += tokens
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return json.loads(json.dumps(self.usage))
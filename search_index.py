@@ -0,0 +1,281 @@
+import argparse
+import functools
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_store import RUNS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(RUNS_DIR, "search.sqlite"))
+SNIPPET_TOKENS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    agent TEXT,
+    scenario TEXT,
+    passed INTEGER,
+    created_at REAL NOT NULL,
+    -- The call's documents are the contiguous rowids first_doc..last_doc
+    first_doc INTEGER,
+    last_doc INTEGER,
+    UNIQUE (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS calls_created_at ON calls (created_at);
+CREATE TABLE IF NOT EXISTS evals (
+    call_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    passed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS evals_call ON evals (call_id, name);
+-- One document per transcript and one per evaluation reason
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5 (
+    call_id UNINDEXED,
+    kind UNINDEXED,
+    eval_name UNINDEXED,
+    passed UNINDEXED,
+    body,
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+class SearchError(ValueError):
+    """A query the full-text engine can't parse"""
+
+
+def transcript_text(transcript: list[dict]) -> str:
+    return "\n".join(
+        f"{message.get('role', '')}: {message.get('content') or ''}"
+        for message in transcript
+        if message.get("role") != "system"
+    )
+
+
+class SearchIndex:
+    """SQLite FTS5 index over persisted transcripts and evaluation reasons.
+
+    Runs are added as they are saved, one write transaction each, on a
+    single background thread; queries use their own connection (WAL lets
+    them read while a run is being written).
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="search-index")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = self._connect()
+        return self._local.connection
+
+    def submit(self, run: dict):
+        """Index a saved run in the background"""
+        future = self._executor.submit(self.index_run, run)
+        future.add_done_callback(
+            lambda f: f.exception()
+            and logger.error(f"Failed to index run {run['run_id']}: {f.exception()}")
+        )
+
+    def index_run(self, run: dict):
+        """(Re)index every result of a stored run"""
+        created_at = run.get("created_at") or time.time()
+        with self._write_lock, self._writer as db:
+            # A re-saved run may have fewer results than before
+            self._delete_run(db, run["run_id"])
+            for position, result in enumerate(run["result"]):
+                self._index_result(db, run["run_id"], position, result, created_at)
+
+    def _delete_run(self, db, run_id: str):
+        calls = db.execute(
+            "SELECT id, first_doc, last_doc FROM calls WHERE run_id = ?", (run_id,)
+        ).fetchall()
+        for call_id, first_doc, last_doc in calls:
+            if first_doc is not None:
+                db.execute(
+                    "DELETE FROM docs WHERE rowid BETWEEN ? AND ?", (first_doc, last_doc)
+                )
+            db.execute("DELETE FROM evals WHERE call_id = ?", (call_id,))
+        db.execute("DELETE FROM calls WHERE run_id = ?", (run_id,))
+
+    def _index_result(self, db, run_id: str, position: int, result: dict, created_at: float):
+        test = result.get("test") or {}
+        evaluations = (result.get("evaluation_results") or {}).get("evaluation_results") or []
+        passed = all(e["passed"] for e in evaluations) if evaluations else None
+
+        call_id = db.execute(
+            "INSERT INTO calls (run_id, position, agent, scenario, passed, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                position,
+                (test.get("agent") or {}).get("name"),
+                (test.get("scenario") or {}).get("name"),
+                passed,
+                created_at,
+            ),
+        ).lastrowid
+
+        docs = []
+        text = transcript_text(result.get("transcript") or [])
+        if text:
+            docs.append((call_id, "transcript", None, passed, text))
+        for e in evaluations:
+            db.execute(
+                "INSERT INTO evals (call_id, name, passed) VALUES (?, ?, ?)",
+                (call_id, e["name"], e["passed"]),
+            )
+            if e.get("reason"):
+                docs.append((call_id, "reason", e["name"], e["passed"], e["reason"]))
+        rowids = [
+            db.execute(
+                "INSERT INTO docs (call_id, kind, eval_name, passed, body)"
+                " VALUES (?, ?, ?, ?, ?)",
+                doc,
+            ).lastrowid
+            for doc in docs
+        ]
+        if rowids:
+            db.execute(
+                "UPDATE calls SET first_doc = ?, last_doc = ? WHERE id = ?",
+                (rowids[0], rowids[-1], call_id),
+            )
+
+    def search(
+        self,
+        query: str,
+        agent: str | None = None,
+        scenario: str | None = None,
+        eval_name: str | None = None,
+        passed: bool | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        kind: str | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict]:
+        """Best-matching transcripts and reasons first (BM25), with snippets.
+
+        `query` is FTS5 syntax: words, "exact phrases", OR, NOT, prefix*.
+        For a transcript, `passed` and `eval_name` refer to the call's
+        evaluations; for a reason, to that evaluation.
+        """
+        where = ["docs MATCH ?"]
+        params: list = [query]
+        for column, value in (("c.agent", agent), ("c.scenario", scenario), ("d.kind", kind)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("c.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("c.created_at < ?")
+            params.append(until)
+
+        if eval_name is not None:
+            eval_filter = "e.name = ?" + ("" if passed is None else " AND e.passed = ?")
+            where.append(
+                "((d.kind = 'reason' AND d.eval_name = ?"
+                + ("" if passed is None else " AND d.passed = ?")
+                + ") OR (d.kind = 'transcript' AND EXISTS"
+                f" (SELECT 1 FROM evals e WHERE e.call_id = c.id AND {eval_filter})))"
+            )
+            params += [eval_name] + ([] if passed is None else [int(passed)])
+            params += [eval_name] + ([] if passed is None else [int(passed)])
+        elif passed is not None:
+            where.append("d.passed = ?")
+            params.append(int(passed))
+
+        sql = (
+            "SELECT c.run_id, c.position, c.agent, c.scenario, c.created_at,"
+            " d.kind, d.eval_name, d.passed,"
+            f" snippet(docs, 4, '[', ']', '...', {SNIPPET_TOKENS}), bm25(docs)"
+            " FROM docs d JOIN calls c ON c.id = d.call_id"
+            f" WHERE {' AND '.join(where)}"
+            " ORDER BY bm25(docs) LIMIT ? OFFSET ?"
+        )
+        try:
+            rows = self._reader().execute(sql, params + [limit, offset]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise SearchError(str(e)) from e
+
+        return [
+            {
+                "run_id": run_id,
+                "position": position,
+                "agent": agent_name,
+                "scenario": scenario_name,
+                "created_at": created_at,
+                "kind": doc_kind,
+                "eval_name": doc_eval,
+                "passed": None if doc_passed is None else bool(doc_passed),
+                "snippet": snippet,
+                # bm25() is lower for better matches
+                "score": round(-score, 4),
+            }
+            for (
+                run_id,
+                position,
+                agent_name,
+                scenario_name,
+                created_at,
+                doc_kind,
+                doc_eval,
+                doc_passed,
+                snippet,
+                score,
+            ) in rows
+        ]
+
+    def rebuild(self, runs_dir: str = RUNS_DIR) -> int:
+        """Index every persisted run; for existing stores and after schema changes"""
+        count = 0
+        for path in sorted(glob.glob(os.path.join(runs_dir, "*", "results.json"))):
+            try:
+                with open(path) as f:
+                    run = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping {path}: {e}")
+                continue
+            run.setdefault("created_at", os.path.getmtime(path))
+            self.index_run(run)
+            count += 1
+        with self._write_lock, self._writer as db:
+            db.execute("INSERT INTO docs (docs) VALUES ('optimize')")
+        return count
+
+
+@functools.cache
+def get_search_index() -> SearchIndex:
+    return SearchIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the transcript search index")
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    index = get_search_index()
+    print(f"Indexed {index.rebuild(args.runs_dir)} runs into {index.path}")
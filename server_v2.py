@@ -1,10 +1,36 @@
+import asyncio
+import functools
+import os
 import subprocess
+import time
 import json
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from datetime import datetime
+from dotenv import load_dotenv
+from compression import CompressionMiddleware
+from admission import AdmissionController, AdmissionRejected, classify_priority
+from ports import OUTBOUND_WEBHOOK_PORT, caller_numbers, inbound_ports
+from scheduler import DEFAULT_TENANT, FairScheduler, UsageLedger, load_tenant_config
+from profiler import profiling
+from pipeline import checks_by_eval, error_result, eval_stage
+from trials import TrialTracker, trial_result
+from durations import (
+    DurationHistory,
+    SuiteProgress,
+    expected_test_seconds,
+    fingerprint,
+    longest_first,
+)
+from audio_analysis import INBOUND_AGENT_CHANNEL, OUTBOUND_AGENT_CHANNEL
+from recording_store import parse_range, read_range, recording_store
+from search_index import SearchError, get_search_index
+from rollups import ALL, GRANULARITIES, TEST, get_rollups
+import run_store
 
 # Configure logging
 logging.basicConfig(
@@ -14,11 +40,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Workers read their credentials from the environment, in-process or not
+load_dotenv(override=True)
+
+# "subprocess" runs each suite in a fresh worker process; "inprocess" awaits
+# the worker coroutines directly. Requests may override it per run.
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "subprocess")
+
+# One outbound run at a time: they share the Vapi assistant and webhook port
+outbound_lock = asyncio.Lock()
+
+# How long a terminated worker gets to hang up calls and close tunnels
+WORKER_CANCEL_GRACE_SECONDS = float(os.getenv("WORKER_CANCEL_GRACE_SECONDS", "10"))
+DISCONNECT_POLL_SECONDS = 1.0
+
+# Runs in flight by run_id, for POST /runs/{run_id}/cancel
+active_runs: dict[str, asyncio.Task] = {}
+
+# Concurrent runs, and how many more may wait before we shed load with 503
+admission = AdmissionController(
+    max_active=int(os.getenv("MAX_ACTIVE_RUNS", "4")),
+    max_queued=int(os.getenv("MAX_QUEUED_RUNS", "32")),
+    # Runs one tenant may hold at once, and slots only interactive runs may use
+    tenant_cap=int(os.getenv("MAX_ACTIVE_RUNS_PER_TENANT", "2")),
+    interactive_reserve=int(os.getenv("INTERACTIVE_RESERVED_RUNS", "1")),
+)
+
+# Tests from all admitted runs share the phone lines, interleaved per test by
+# weighted fair queueing across tenants. Outbound tests get a single line
+# since they share one Vapi assistant.
+TENANT_WEIGHTS = load_tenant_config("TENANT_WEIGHTS")
+TENANT_CAPS = load_tenant_config("TENANT_MAX_CONCURRENCY")
+line_schedulers = {
+    "inbound": FairScheduler(
+        int(os.getenv("INBOUND_LINES", "8")), TENANT_WEIGHTS, TENANT_CAPS
+    ),
+    "outbound": FairScheduler(1, TENANT_WEIGHTS, TENANT_CAPS),
+}
+usage_ledger = UsageLedger()
+
+# Call and evaluation seconds per scenario, for longest-first ordering and ETAs
+duration_history = DurationHistory()
+# Progress of suites in flight by run_id, for GET /status
+suite_progress: dict[str, SuiteProgress] = {}
+
+# Recording channel of the agent under test
+AGENT_CHANNELS = {"inbound": INBOUND_AGENT_CHANNEL, "outbound": OUTBOUND_AGENT_CHANNEL}
+
 
 # Define Pydantic model for request validation
+class EvaluationCheck(BaseModel):
+    # "keyword", "regex", "max_turns" or "min_turns"
+    type: str
+    # Whose turns to look at: "agent", "user" or "any"
+    role: str = "agent"
+    keywords: list[str] = []
+    pattern: str | None = None
+    turns: int | None = None
+    # Verdict when the check matches / misses: "pass", "fail" or "escalate"
+    on_match: str = "pass"
+    on_miss: str = "escalate"
+
+
 class EvaluationModel(BaseModel):
     eval_name: str
     eval_success_criteria: str
+    # Cheap local checks tried before any LLM; the first decisive one wins
+    checks: list[EvaluationCheck] = []
+
+
+class TrialsConfig(BaseModel):
+    # Calls stop once every evaluation's interval settles above or below
+    # pass_rate, or after max_trials
+    min_trials: int = 3
+    max_trials: int = 30
+    # Trials on the line at once
+    concurrency: int = 3
+    pass_rate: float = 0.7
+    confidence: float = 0.9
 
 
 class TestModel(BaseModel):
@@ -27,18 +126,34 @@ class TestModel(BaseModel):
     scenario_name: str
     scenario_description: str
     evaluations: list[EvaluationModel]
+    # Repeat the call adaptively instead of once
+    trials: TrialsConfig | None = None
 
 
 class TestRequest(BaseModel):
     tests: list[TestModel]
     agent_type: str
     phone_number: str | None = None
+    # "subprocess" or "inprocess"; defaults to EXECUTION_MODE
+    execution_mode: str | None = None
+    # Client-chosen id so the run can be cancelled while in flight
+    run_id: str | None = None
+    # "interactive" or "bulk"; defaults to interactive for single-test runs
+    priority: str | None = None
+    # Team the run is scheduled and billed for; falls back to X-Tenant-Id
+    tenant: str | None = None
+    # Sample the server and worker stacks for this run (or send X-Profile: 1).
+    # Worker profiles cover only this run; the server profile samples every
+    # thread in the process, so it includes whatever else runs meanwhile.
+    profile: bool = False
 
 
 class EvaluationResult(BaseModel):
     name: str
     passed: bool
     reason: str
+    # Which evaluator tier decided it: "rules" or the LLM model name
+    tier: Optional[str] = None
 
 
 class EvaluationResults(BaseModel):
@@ -68,12 +183,20 @@ class TestResult(BaseModel):
     evaluation_results: Optional[EvaluationResults] = None
     transcript: List[Dict[str, str]]
     stereo_recording_url: Optional[str] = None
+    # Local copy of the recording, served from GET /recordings/{recording_id}
+    recording_id: Optional[str] = None
+    # Seconds the call held a line; its duration when audio wasn't analysed
+    call_seconds: Optional[float] = None
     error: Optional[str] = None
 
 
 class TestResultsResponse(BaseModel):
     result: List[TestResult]
     error: Optional[str] = None
+    run_id: Optional[str] = None
+    total: Optional[int] = None
+    offset: Optional[int] = None
+    next_offset: Optional[int] = None
 
 
 """
@@ -134,19 +257,101 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
-
-
-async def run_inbound_subprocess(request_data: TestRequest) -> TestResultsResponse:
+# gzip/zstd by Accept-Encoding for JSON bodies
+app.add_middleware(CompressionMiddleware)
+
+
+async def stored_results_response(
+    run_id: str, output: list, fields: str | None, offset: int, limit: int | None
+) -> JSONResponse:
+    """Validate worker output once, store it as a run and return the requested page.
+
+    The body is built directly rather than through response_model so projected
+    pages are not re-validated against the full TestResult schema.
+    """
+    validated = TestResultsResponse(result=output)
+    results = [result.model_dump(mode="json") for result in validated.result]
+    # The JSON write can take a while for long suites; keep it off the loop
+    run = await asyncio.to_thread(run_store.save_run, run_id, results)
+    get_search_index().submit(run)
+    # Rolled up from the stored run, as `rollups.py` rebuilds do, so live
+    # and rebuilt trends agree
+    for result in run["result"]:
+        get_rollups().submit(result, at=run["created_at"])
+    return JSONResponse(run_store.page(run, fields, offset, limit))
+
+
+def profile_dir(request_data: TestRequest) -> str | None:
+    """Where a profiled run's stacks go, next to its results"""
+    if not (request_data.profile and request_data.run_id):
+        return None
+    return os.path.join(run_store.run_dir(request_data.run_id), "profile")
+
+
+def worker_payload(request_data: TestRequest) -> dict:
+    """Worker input: the request, with grading left to our eval stage so the
+    line is freed as soon as the call ends"""
+    return {**request_data.model_dump(), "defer_evaluation": True}
+
+
+def worker_env(request_data: TestRequest, **extra) -> dict:
+    env = {**os.environ, **extra}
+    directory = profile_dir(request_data)
+    if directory:
+        env["WORKER_PROFILE_DIR"] = directory
+    return env
+
+
+async def run_worker_process(
+    script: str, request_data: TestRequest, env: dict | None = None
+) -> subprocess.CompletedProcess:
+    """Run a worker script without blocking the event loop.
+
+    If the awaiting task is cancelled the worker gets SIGTERM (which it turns
+    into a cancellation that hangs up calls and closes tunnels), then SIGKILL
+    after WORKER_CANCEL_GRACE_SECONDS.
+    """
+    args = ["python", script]
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+    )
+    try:
+        stdout, _ = await process.communicate(
+            json.dumps(worker_payload(request_data)).encode("utf-8")
+        )
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            logger.info(f"Terminating worker {process.pid}")
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), WORKER_CANCEL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(f"Worker {process.pid} ignored SIGTERM, killing it")
+                process.kill()
+        raise
+    return subprocess.CompletedProcess(
+        args, process.returncode, stdout.decode("utf-8", errors="replace")
+    )
+
+
+async def run_inbound_subprocess(
+    request_data: TestRequest, port: int, caller_number: str | None = None
+) -> TestResultsResponse:
     try:
         logger.info(f"Starting subprocess with request data: {request_data}")
 
-        result = subprocess.run(
-            ["python", "test_inbound.py"],
-            input=json.dumps(request_data.model_dump()),
-            text=True,
-            encoding="utf-8",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+        result = await run_worker_process(
+            "test_inbound.py",
+            request_data,
+            env=worker_env(
+                request_data,
+                WORKER_PORT=str(port),
+                **({"WORKER_CALLER_NUMBER": caller_number} if caller_number else {}),
+            ),
         )
 
         logger.debug(f"Subprocess output: {result.stdout}")
@@ -183,13 +388,8 @@ async def run_outbound_subprocess(request_data: TestRequest) -> TestResultsRespo
     try:
         logger.info(f"Starting subprocess with request data: {request_data}")
 
-        result = subprocess.run(
-            ["python", "test_outbound.py"],
-            input=json.dumps(request_data.model_dump()),
-            text=True,
-            encoding="utf-8",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+        result = await run_worker_process(
+            "test_outbound.py", request_data, env=worker_env(request_data)
         )
 
         logger.debug(f"Subprocess output: {result.stdout}")
@@ -224,72 +424,579 @@ async def run_outbound_subprocess(request_data: TestRequest) -> TestResultsRespo
         logger.error(f"Unexpected error in run_inbound_subprocess: {str(e)}", exc_info=True)
         return {"error": str(e)}
 
+async def run_inprocess(
+    request_data: TestRequest, port: int, caller_number: str | None = None
+) -> dict:
+    """Await the worker coroutine directly instead of spawning a process.
+
+    Each run gets its own task group and per-run state in the worker, so
+    concurrent runs don't share webhook data or shutdown events.
+    """
+    main_data = worker_payload(request_data)
+    if request_data.agent_type == "inbound":
+        import test_inbound
+
+        runner = functools.partial(test_inbound.run_tests, caller_number=caller_number)
+    else:
+        import test_outbound
+
+        runner = test_outbound.run_tests
+
+    logger.info(f"Starting in-process {request_data.agent_type} run on port {port}")
+    async with asyncio.TaskGroup() as group:
+        task = group.create_task(runner(main_data, port=port))
+    result = task.result()
+
+    # The outbound worker returns bare results; match the subprocess envelope
+    if isinstance(result, list):
+        return {"output": result}
+    return result
+
+
+async def run_worker(request_data: TestRequest) -> dict:
+    """Run a suite through the inbound/outbound worker in the requested execution mode"""
+    mode = request_data.execution_mode or EXECUTION_MODE
+    if request_data.agent_type == "inbound":
+        # Concurrent inbound workers dial from different numbers where we have them
+        with caller_numbers.number() as caller_number:
+            async with inbound_ports.port() as port:
+                if mode == "inprocess":
+                    return await run_inprocess(request_data, port, caller_number)
+                return await run_inbound_subprocess(request_data, port, caller_number)
+
+    async with outbound_lock:
+        if mode == "inprocess":
+            return await run_inprocess(request_data, OUTBOUND_WEBHOOK_PORT)
+        return await run_outbound_subprocess(request_data)
+
+
+async def run_scheduled_test(request_data: TestRequest, index: int, tenant: str) -> dict:
+    """Run one test of a suite once the tenant's fair share gives it a line.
+
+    The line is held for the call only; grading happens in the eval stage
+    afterwards, overlapping with the calls of the suite's other tests.
+    """
+    test = request_data.tests[index]
+    single = request_data.model_copy(update={"tests": [test]})
+    progress = suite_progress.get(request_data.run_id)
+    async with line_schedulers[request_data.agent_type].slot(
+        tenant, priority=request_data.priority or "bulk"
+    ):
+        if progress:
+            progress.call_started(index)
+        start = time.monotonic()
+        try:
+            output = await run_worker(single)
+        except Exception as e:
+            # Keep the suite's other tests running
+            logger.error(f"Worker failed: {str(e)}", exc_info=True)
+            output = {"error": str(e)}
+        finally:
+            if progress:
+                progress.call_ended(index)
+        elapsed = time.monotonic() - start
+
+    worker_results = output.get("output") if isinstance(output, dict) else None
+    if isinstance(worker_results, list):
+        # Download recordings in the background before their URLs expire
+        for result in worker_results:
+            recording_store.attach(result)
+        eval_start = time.monotonic()
+        results = await eval_stage.evaluate_all(
+            worker_results,
+            checks_by_eval([test.model_dump()]),
+            AGENT_CHANNELS[request_data.agent_type],
+        )
+        if results and not any(result.get("error") for result in results):
+            duration_history.record(
+                fingerprint(request_data.agent_type, test.model_dump()),
+                elapsed / len(results),
+                time.monotonic() - eval_start,
+            )
+    else:
+        error = output.get("error") if isinstance(output, dict) else None
+        if isinstance(worker_results, dict):
+            error = error or worker_results.get("error")
+        results = [
+            error_result(test.model_dump(), error or "Unexpected worker response")
+        ]
+
+    for result in results:
+        result.setdefault("call_seconds", round(elapsed / max(1, len(results)), 3))
+        usage_ledger.record_result(tenant, result, elapsed / max(1, len(results)))
+    return {"output": results, "failed": not isinstance(worker_results, list)}
+
+
+async def run_trials(request_data: TestRequest, index: int, tenant: str) -> dict:
+    """Call one test repeatedly, up to `concurrency` at a time, until every
+    evaluation's pass rate is settled or max_trials is reached.
+
+    Trials still in flight when it settles are cancelled. A cancelled worker
+    hangs up only the call SIDs its own TestRunner placed, so sibling tests
+    and other tenants dialing the same agent are unaffected.
+    """
+    test = request_data.tests[index]
+    config = test.trials
+    max_trials = max(1, config.max_trials)
+    tracker = TrialTracker(
+        [e.eval_name for e in test.evaluations],
+        config.pass_rate,
+        config.confidence,
+        config.min_trials,
+        max_trials,
+    )
+    results = []
+    pending = set()
+    launched = 0
+
+    def launch():
+        nonlocal launched
+        launched += 1
+        pending.add(asyncio.create_task(run_scheduled_test(request_data, index, tenant)))
+
+    try:
+        while pending or launched < max_trials:
+            while launched < max_trials and len(pending) < max(1, config.concurrency):
+                launch()
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+            settled = False
+            for task in done:
+                for result in task.result()["output"]:
+                    results.append(result)
+                    # Checked per result so no scheduled look is skipped, and
+                    # the verdict stands as of the look that settled it
+                    if not settled:
+                        tracker.record(result)
+                        settled = tracker.settled
+            if settled:
+                break
+    finally:
+        # Each cancelled trial hangs up its own call only (see dial_tests)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    logger.info(
+        f"{test.scenario_name}: {tracker.graded} trials graded, settled={tracker.settled}"
+    )
+    stopped_early = launched < max_trials or bool(pending)
+    return {
+        "output": [trial_result(test.model_dump(), results, tracker, stopped_early)],
+        "failed": tracker.graded == 0,
+    }
+
+
+async def run_suite(request_data: TestRequest, tenant: str) -> dict:
+    """Split a suite into per-test runs scheduled fairly against other tenants,
+    then merge their results in request order.
+
+    Tests are queued longest-expected-first, so the suite's long calls
+    overlap with its short ones instead of finishing alone at the end.
+    """
+    usage_ledger.record_run(tenant)
+    expected = [
+        expected_test_seconds(duration_history, request_data.agent_type, test.model_dump())
+        for test in request_data.tests
+    ]
+    order = longest_first(expected)
+    scheduler = line_schedulers[request_data.agent_type]
+    progress = SuiteProgress(expected, order, min(scheduler.slots, scheduler.cap(tenant)))
+    if request_data.run_id:
+        suite_progress[request_data.run_id] = progress
+
+    async def run_test(index: int) -> dict:
+        test = request_data.tests[index]
+        try:
+            return await (run_trials if test.trials else run_scheduled_test)(
+                request_data, index, tenant
+            )
+        finally:
+            progress.finished(index)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            # Tasks reach the line scheduler in creation order
+            tasks = {index: group.create_task(run_test(index)) for index in order}
+    finally:
+        suite_progress.pop(request_data.run_id, None)
+    outcomes = [tasks[index].result() for index in range(len(request_data.tests))]
+
+    if all(outcome["failed"] for outcome in outcomes):
+        errors = dict.fromkeys(
+            result["error"] for outcome in outcomes for result in outcome["output"]
+        )
+        return {"error": "; ".join(errors)}
+    return {"output": [result for outcome in outcomes for result in outcome["output"]]}
+
+
+async def cancel_on_disconnect(request: Request, task: asyncio.Task):
+    while not task.done():
+        if await request.is_disconnected():
+            logger.info("Client disconnected, cancelling run")
+            task.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def run_cancellable(
+    request: Request, run_id: str, request_data: TestRequest, ticket, tenant: str
+):
+    """Wait for admission, then run the worker, as a task that a client
+    disconnect or POST /runs/{run_id}/cancel can cancel (queued or running).
+    Returns None if it was cancelled."""
+
+    async def admitted_run():
+        async with ticket:
+            # In-process workers are covered by the server-side profile, which
+            # samples the whole process: concurrent runs show up in it too
+            with profiling(profile_dir(request_data), "server"):
+                outcome = await run_suite(request_data, tenant)
+            if "error" in outcome:
+                ticket.failed()
+            return outcome
+
+    task = asyncio.create_task(admitted_run())
+    active_runs[run_id] = task
+    watcher = asyncio.create_task(cancel_on_disconnect(request, task))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        # Only swallow cancellation of the run itself, not of this handler
+        if asyncio.current_task().cancelling():
+            raise
+        logger.info(f"Run {run_id} cancelled")
+        return None
+    finally:
+        watcher.cancel()
+        active_runs.pop(run_id, None)
+        # No-op once the run has used its slot
+        ticket.cancel()
+
+
 @app.post("/runTests", response_model=TestResultsResponse)
-async def run_tests(request_data: TestRequest):
+async def run_tests(
+    request: Request,
+    request_data: TestRequest,
+    fields: str | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+):
+    """Run a suite. `fields` is a comma-separated list of dotted TestResult paths
+    or a preset ("verdicts", "summary"); `offset`/`limit` page over results.
+    Later pages come from GET /runs/{run_id}/results.
+
+    With `profile`, stacks go to runs/<run_id>/profile: one file per worker
+    process, and "server", which is process-wide - it also samples other
+    runs and requests served while this one is in flight."""
     logger.info("Received /runTests request")
+    run_id = request_data.run_id or run_store.new_run_id()
+    if not run_store.valid_run_id(run_id):
+        return JSONResponse(
+            TestResultsResponse(
+                result=[], error="run_id must match [A-Za-z0-9_-]{1,64}", run_id=run_id
+            ).model_dump(),
+            status_code=400,
+        )
+    if limit is not None and limit < 1:
+        return JSONResponse(
+            TestResultsResponse(
+                result=[], error="limit must be at least 1", run_id=run_id
+            ).model_dump(),
+            status_code=400,
+        )
+    if run_id in active_runs:
+        return TestResultsResponse(
+            result=[], error=f"Run {run_id} is already in progress", run_id=run_id
+        )
     logger.debug(f"Request data: {request_data}")
 
     if not request_data.tests:
         logger.error("No tests provided in request")
-        return TestResultsResponse(result=[], error="No tests provided")
+        return TestResultsResponse(result=[], error="No tests provided", run_id=run_id)
 
     if not request_data.agent_type:
         logger.error("Agent type not provided in request")
-        return TestResultsResponse(result=[], error="Agent type is required")
+        return TestResultsResponse(
+            result=[], error="Agent type is required", run_id=run_id
+        )
 
     if not request_data.phone_number:
         logger.error("Phone number not provided for voice agent")
         return TestResultsResponse(
-            result=[], error="Phone number is required for voice agent"
+            result=[], error="Phone number is required for voice agent", run_id=run_id
+        )
+
+    if request_data.agent_type not in ("inbound", "outbound"):
+        logger.error(f"Unsupported agent type: {request_data.agent_type}")
+        return TestResultsResponse(
+            result=[],
+            error=f"Unsupported agent type: {request_data.agent_type}",
+            run_id=run_id,
+        )
+
+    tenant = (
+        request_data.tenant or request.headers.get("x-tenant-id") or DEFAULT_TENANT
+    )
+    profile = request_data.profile or request.headers.get("x-profile") == "1"
+    request_data = request_data.model_copy(
+        update={"run_id": run_id, "profile": profile}
+    )
+    priority = classify_priority(request_data.priority, len(request_data.tests))
+    # Carried to the line scheduler so interactive tests jump bulk ones
+    request_data = request_data.model_copy(update={"priority": priority})
+    try:
+        ticket = admission.reserve(priority, tenant)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejecting {priority} run {run_id}: {e}")
+        return JSONResponse(
+            TestResultsResponse(result=[], error=str(e), run_id=run_id).model_dump(),
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
         )
 
     if request_data.agent_type == "inbound":
         try:
-            result = await run_inbound_subprocess(request_data)
+            result = await run_cancellable(
+                request, run_id, request_data, ticket, tenant
+            )
             logger.debug(f"Subprocess result: {result}")
 
+            if result is None:
+                return TestResultsResponse(
+                    result=[], error="Run cancelled", run_id=run_id
+                )
+
             # Check if result is an error response
             if isinstance(result, dict) and "error" in result:
                 logger.error(f"Error from subprocess: {result['error']}")
-                return TestResultsResponse(result=[], error=result["error"])
+                return TestResultsResponse(
+                    result=[], error=result["error"], run_id=run_id
+                )
 
             # Check if result has output
             if isinstance(result, dict) and "output" in result:
                 logger.info("Successfully processed test request")
-                return TestResultsResponse(result=result["output"], error=None)
+                return await stored_results_response(
+                    run_id, result["output"], fields, offset, limit
+                )
 
             # Fallback error if response format is unexpected
             logger.error(f"Unexpected response format from inbound subprocess: {result}")
             return TestResultsResponse(
-                result=[], error="Unexpected response format from inbound subprocess"
+                result=[],
+                error="Unexpected response format from inbound subprocess",
+                run_id=run_id,
             )
 
         except Exception as e:
             logger.error(f"Exception in run_tests: {str(e)}", exc_info=True)
-            return TestResultsResponse(result=[], error=str(e))
+            return TestResultsResponse(result=[], error=str(e), run_id=run_id)
 
     if request_data.agent_type == "outbound":
         try:
-            result = await run_outbound_subprocess(request_data)
+            result = await run_cancellable(
+                request, run_id, request_data, ticket, tenant
+            )
             logger.debug(f"Subprocess result: {result}")
 
+            if result is None:
+                return TestResultsResponse(
+                    result=[], error="Run cancelled", run_id=run_id
+                )
+
             if isinstance(result, dict) and "error" in result:
                 logger.error(f"Error from subprocess: {result}")
-                return TestResultsResponse(result=[], error=result["error"])
+                return TestResultsResponse(
+                    result=[], error=result["error"], run_id=run_id
+                )
 
             # Check if result has output
             if isinstance(result, dict) and "output" in result:
                 logger.info("Successfully processed test request")
-                return TestResultsResponse(result=result["output"], error=None)
+                return await stored_results_response(
+                    run_id, result["output"], fields, offset, limit
+                )
 
             logger.error(f"Unexpected response format from outbound subprocess: {result}")
             return TestResultsResponse(
-                result=[], error="Unexpected response format from outbound subprocess"
+                result=[],
+                error="Unexpected response format from outbound subprocess",
+                run_id=run_id,
             )
 
         except Exception as e:
             logger.error(f"Exception in run_tests: {str(e)}", exc_info=True)
-            return TestResultsResponse(result=[], error=str(e))
+            return TestResultsResponse(result=[], error=str(e), run_id=run_id)
+
+
+@app.get("/status")
+async def get_status():
+    return {
+        "admission": admission.status(),
+        "lines": {kind: s.status() for kind, s in line_schedulers.items()},
+        "active_runs": list(active_runs),
+        "progress": {run_id: p.status() for run_id, p in suite_progress.items()},
+    }
+
+
+@app.get("/tenants/usage")
+async def get_tenant_usage():
+    return usage_ledger.snapshot()
+
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    task = active_runs.get(run_id)
+    if task is None:
+        return JSONResponse(
+            {"cancelled": False, "error": f"No active run {run_id}"}, status_code=404
+        )
+    task.cancel()
+    logger.info(f"Cancellation requested for run {run_id}")
+    return {"cancelled": True, "run_id": run_id}
+
+
+@app.get("/runs/{run_id}/results", response_model=TestResultsResponse)
+async def get_run_results(
+    run_id: str,
+    fields: str | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+):
+    if not run_store.valid_run_id(run_id):
+        return JSONResponse(
+            {"result": [], "error": f"Invalid run_id {run_id!r}"}, status_code=400
+        )
+    if limit is not None and limit < 1:
+        return JSONResponse(
+            {"result": [], "error": "limit must be at least 1"}, status_code=400
+        )
+    run = await asyncio.to_thread(run_store.load_run, run_id)
+    if run is None:
+        return JSONResponse(
+            {"result": [], "error": f"Unknown run {run_id}"}, status_code=404
+        )
+    return JSONResponse(run_store.page(run, fields, offset, limit))
+
+
+@app.get("/search")
+async def search(
+    q: str,
+    agent: str | None = None,
+    scenario: str | None = None,
+    eval_name: str | None = None,
+    passed: bool | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    kind: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    """Full-text search over stored transcripts and evaluation reasons.
+
+    `q` takes FTS5 syntax ("exact phrase", OR, NOT, prefix*); `kind` is
+    "transcript" or "reason". Best matches first, with highlighted snippets.
+    """
+    start = time.perf_counter()
+    try:
+        results = await asyncio.to_thread(
+            get_search_index().search,
+            q,
+            agent=agent,
+            scenario=scenario,
+            eval_name=eval_name,
+            passed=passed,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+            kind=kind,
+            limit=max(1, min(limit, 200)),
+            offset=max(0, offset),
+        )
+    except SearchError as e:
+        return JSONResponse({"results": [], "error": str(e)}, status_code=400)
+    return {
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+@app.get("/trends")
+async def get_trends(
+    agent: str = ALL,
+    scenario: str = ALL,
+    eval_name: str = TEST,
+    granularity: str = "day",
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Pass rate, duration and response-latency percentiles per time bucket,
+    read from rollups maintained as results arrive. "*" (the default) means
+    every agent or scenario; an empty eval_name means whole-test passes."""
+    if granularity not in GRANULARITIES:
+        return JSONResponse(
+            {"error": f"granularity must be one of {', '.join(GRANULARITIES)}"},
+            status_code=400,
+        )
+    points = await asyncio.to_thread(
+        get_rollups().trends,
+        agent,
+        scenario,
+        eval_name,
+        granularity,
+        since.timestamp() if since else None,
+        until.timestamp() if until else None,
+    )
+    return {
+        "agent": agent,
+        "scenario": scenario,
+        "eval_name": eval_name,
+        "granularity": granularity,
+        "points": points,
+    }
+
+
+@app.get("/recordings/{recording_id}")
+async def get_recording(recording_id: str, request: Request):
+    """A stored call recording; honours single byte ranges so players can seek"""
+    stored = recording_store.lookup(recording_id)
+    if stored is None:
+        future = recording_store.pending(recording_id)
+        if future is not None:
+            try:
+                stored = await asyncio.wrap_future(future)
+            except Exception as e:
+                logger.error(f"Recording {recording_id} failed to download: {e}")
+    if stored is None:
+        return JSONResponse(
+            {"error": f"Unknown recording {recording_id}"}, status_code=404
+        )
+
+    path = os.path.join(recording_store.root, stored["path"])
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{stored["sha256"]}"'}
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError as e:
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=416,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        read_range(path, start, end),
+        status_code=status_code,
+        media_type=stored["content_type"],
+        headers=headers,
+    )
 
 
 if __name__ == "__main__":
@@ -1,84 +1,55 @@
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 import asyncio
-import os
-from dotenv import load_dotenv
+import functools
 import logging
-from fixa import Test, Agent, Scenario, Evaluation, TestRunner
-from fixa.evaluators import LocalEvaluator
-import ngrok
 import os, sys, json
-from openai import OpenAI
 
+from cassette import areplayable, interaction_key
+from pipeline import checks_by_eval, eval_stage
+from ports import twilio_phone_numbers
 
-class EvalResult(BaseModel):
-    name: str
-    passed: bool
-    reason: str
+# Heavy dependencies (fixa, ngrok, openai, numpy/scipy) are imported where
+# they are first needed so a cold worker starts quickly; see
+# bench_cold_start.py for the budget.
 
 
-class EvalResults(BaseModel):
-    evaluation_results: list[EvalResult]
-
-
-# Set up logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    stream=sys.stderr,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv(override=True)
-
-print("Starting subprocess")
-
-client = OpenAI()
-TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
-
-
-def manual_evals(serial_result):
-    """Evaluate and serialize call data processing"""
-    logger.info("Evaluating call data manually...")
-
-    messages = serial_result["transcript"]
-    # if message role is "system" remove it from the list
-    messages = [message for message in messages if message["role"] != "system"]
-    messages = [
-        {
-            "role": "user" if message["role"] == "assistant" else "AI",
-            "content": message["content"],
-        }
-        for message in messages
-    ]
-    formatted_messages = str(messages)
-
-    evaluations = str(serial_result["test"]["scenario"]["evaluations"])
-
-    prompt = f"""
-    You are an expert at evaluating phone calls conducted by AI. You will be given a transcript of a call between an AI and a user, along with evaluation criteria to evaluate if the AI passed each of the evaluation criteria.
 
-    Here is the transcrpt of the call:
-    {formatted_messages}
+def make_evaluator(model="gpt-4o"):
+    """LocalEvaluator whose LLM calls go through the shared eval limiter"""
+    return rate_limited_evaluator_class()(model=model)
 
-    Please evaluate if the AI passed each of the evaluation criteria in the provided list:
-    {evaluations}
 
-    For each evaluation result, return the eval_name, passed status, and reason for the evaluation.
-    """
-
-    logger.info("Parsing evaluation prompt...")
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        response_format=EvalResults,
+def fixa_evaluation_prompt(scenario, transcript) -> str:
+    """The messages fixa's LocalEvaluator sends for one call, for token budgeting"""
+    criteria = [e.__dict__ for e in scenario.evaluations]
+    return (
+        f"Evaluate the following transcript against these criteria:\n{criteria}"
+        f"Transcript:\n{str(transcript)}"
     )
 
-    evaluation_results = completion.choices[0].message.parsed
 
-    return evaluation_results.evaluation_results
+@functools.cache
+def rate_limited_evaluator_class():
+    from fixa.evaluators import LocalEvaluator
+    from rate_limiter import eval_limiter
+
+    class RateLimitedLocalEvaluator(LocalEvaluator):
+        def __init__(self, model="gpt-4o", **kwargs):
+            super().__init__(model=model, **kwargs)
+            self.limiter_model = model
+
+        async def evaluate(self, scenario, transcript, stereo_recording_url):
+            return await eval_limiter.acall(
+                self.limiter_model,
+                fixa_evaluation_prompt(scenario, transcript),
+                super().evaluate,
+                scenario,
+                transcript,
+                stereo_recording_url,
+            )
+
+    return RateLimitedLocalEvaluator
 
 
 def serialize_test_results(test_result):
@@ -107,6 +78,7 @@ def serialize_test_results(test_result):
                             "name": eval.name,
                             "passed": eval.passed if eval else False,
                             "reason": (eval.reason if eval else "Unknown reason"),
+                            "tier": "gpt-4o",
                         }
                         for eval in test_result.evaluation_results.evaluation_results
                     ]
@@ -128,7 +100,89 @@ def serialize_test_results(test_result):
     }
 
 
-async def run_tests(main_data):
+def placed_call_sids(test_runner) -> list[str]:
+    """SIDs of the calls a fixa TestRunner has placed so far"""
+    return list(getattr(test_runner, "_call_id_to_test", {}))
+
+
+def hang_up_calls(call_sids):
+    """Hang up this run's calls that are still live.
+
+    Used when a run is cancelled mid-call. Only the given SIDs are touched,
+    so other runs dialing the same agent from the same number keep their calls.
+    """
+    from twilio.rest import Client
+
+    twilio = Client()
+    for sid in call_sids:
+        status = twilio.calls(sid).fetch().status
+        if status in ("queued", "ringing", "in-progress"):
+            logger.info(f"Hanging up {status} call {sid}")
+            twilio.calls(sid).update(
+                status="completed" if status == "in-progress" else "canceled"
+            )
+
+
+async def dial_tests(phone_number, loaded_tests, evaluator, port, caller_number):
+    """Place calls through one fixa TestRunner behind an ngrok tunnel on `port`.
+
+    Returns {"output": serialized results} or {"error": ...}; both are
+    JSON-serializable so the outcome can be recorded to a cassette.
+    """
+    import ngrok
+    from fixa import TestRunner
+
+    # Setup ngrok
+    logger.info(f"Setting up ngrok on port {port}")
+    try:
+        listener = await ngrok.forward(port, authtoken=os.getenv("NGROK_AUTH_TOKEN"))
+    except Exception as e:
+        logger.error(f"Failed to setup ngrok: {str(e)}")
+        return {"error": f"Failed to setup ngrok: {str(e)}"}
+
+    try:
+        # Create test runner
+        try:
+            test_runner = TestRunner(
+                port=port,
+                ngrok_url=listener.url(),
+                twilio_phone_number=caller_number,
+                evaluator=evaluator,
+            )
+        except Exception as e:
+            logger.error(f"[Subprocess] Failed to create test runner: {str(e)}")
+            return {"error": f"[Subprocess] Failed to create test runner: {str(e)}"}
+
+        for test in loaded_tests:
+            test_runner.add_test(test)
+
+        try:
+            test_results = await test_runner.run_tests(
+                phone_number=phone_number, type=TestRunner.OUTBOUND
+            )
+        except asyncio.CancelledError:
+            logger.info("Run cancelled, hanging up active calls")
+            try:
+                await asyncio.to_thread(hang_up_calls, placed_call_sids(test_runner))
+            except Exception as e:
+                logger.error(f"Failed to hang up calls: {str(e)}")
+            raise
+
+        return {
+            "output": [
+                serialize_test_results(test_result)
+                for test_result in test_results or []
+            ]
+        }
+    finally:
+        # Release the tunnel so in-process runs don't leak listeners
+        try:
+            await listener.close()
+        except Exception as e:
+            logger.error(f"Failed to close ngrok listener: {str(e)}")
+
+
+async def run_tests(main_data, port=8765, caller_number=None):
     logger.info("Request received at /runTests")
     print("Request received at /runTests")
 
@@ -148,17 +202,7 @@ async def run_tests(main_data):
         if agent_type == "inbound" and not phone_number:
             return {"error": "Phone number is required for inbound agent"}
 
-        # Setup ngrok
-        port = 8765
-
-        logger.info(f"Setting up ngrok on port {port}")
-        try:
-            listener = await ngrok.forward(
-                port, authtoken=os.getenv("NGROK_AUTH_TOKEN")
-            )
-        except Exception as e:
-            logger.error(f"Failed to setup ngrok: {str(e)}")
-            return {"error": f"Failed to setup ngrok: {str(e)}"}
+        from fixa import Test, Agent, Scenario, Evaluation
 
         # Load tests
         loaded_tests = []
@@ -187,83 +231,54 @@ async def run_tests(main_data):
         if not loaded_tests:
             return {"error": "[Subprocess] No valid tests were loaded"}
 
-        # Create test runner
-        try:
-            test_runner = TestRunner(
-                port=port,
-                ngrok_url=listener.url(),
-                twilio_phone_number=TWILIO_PHONE_NUMBER,
-                evaluator=LocalEvaluator(model="gpt-4o"),
-            )
-        except Exception as e:
-            logger.error(f"[Subprocess] Failed to create test runner: {str(e)}")
-            return {"error": f"[Subprocess] Failed to create test runner: {str(e)}"}
+        checks = checks_by_eval(main_data["tests"])
 
-        for test in loaded_tests:
-            test_runner.add_test(test)
+        # With local checks declared, skip fixa's all-gpt-4o evaluation so every
+        # result goes through the tiered evaluator. When server_v2 pipelines
+        # evaluation (defer_evaluation), fixa only places the calls.
+        defer_evaluation = main_data.get("defer_evaluation", False)
+        evaluator = (
+            None
+            if defer_evaluation or any(checks.values())
+            else make_evaluator(model="gpt-4o")
+        )
+
+        if agent_type != "inbound":
+            return {"error": "[Subprocess] Unsupported agent type"}
 
         logger.info("Running tests asynchronously...")
 
-        test_results = None
         try:
-            if agent_type == "inbound":
-                test_results = await test_runner.run_tests(
-                    phone_number=phone_number, type=TestRunner.OUTBOUND
-                )
-            else:
-                return {"error": "[Subprocess] Unsupported agent type"}
+            # Replayed from the cassette, if one is active, without dialing
+            dialed = await areplayable(
+                "fixa.run_tests",
+                interaction_key(main_data["tests"], phone_number, evaluator is None),
+                dial_tests,
+                phone_number,
+                loaded_tests,
+                evaluator,
+                port,
+                caller_number or (twilio_phone_numbers() or [None])[0],
+            )
+            if "error" in dialed:
+                return dialed
+            serialized_results = dialed["output"]
 
-            if not test_results:
+            if not serialized_results:
                 return {"error": "[Subprocess] Test results were empty"}
 
             logger.info("Tests completed successfully")
-            serialized_results = [
-                serialize_test_results(test_result) for test_result in test_results
-            ]
 
-            final_serial_results = []
-            for idx, result in enumerate(serialized_results):
-                if "evaluation_results" in result:
-                    if (
-                        result["evaluation_results"] == None
-                        or result["evaluation_results"] == []
-                    ):
-                        messages = result["transcript"]
-                        # need to check if role of messages is only system or not in an if statement
-                        if all(message["role"] == "system" for message in messages):
-                            final_serial_results.append(result)
-                            continue
-
-                        logger.info(
-                            f"Found an empty evaluation: {idx}/{len(serialized_results)}"
-                        )
-                        raw_eval_results = manual_evals(result)
-
-                        formatted_eval_results = [
-                            {
-                                "name": eval.name,
-                                "passed": eval.passed,
-                                "reason": eval.reason if eval else "Unknown reason",
-                            }
-                            for eval in raw_eval_results
-                        ]
-
-                        logger.info("Creating dictionary for evaluation results")
-                        result["evaluation_results"] = {}
-
-                        logger.info(
-                            "Assigning eval results second nest to formatted eval results"
-                        )
-
-                        result["evaluation_results"][
-                            "evaluation_results"
-                        ] = formatted_eval_results
+            if defer_evaluation:
+                return {"output": serialized_results}
 
-                        result["evaluation_results"]["extra_data"] = {}
-                        final_serial_results.append(result)
+            from audio_analysis import INBOUND_AGENT_CHANNEL
 
-                    else:
-                        final_serial_results.append(result)
+            # Results fixa left unevaluated are graded concurrently; the
+            # shared eval limiter keeps them under the gpt-4o quota
+            final_serial_results = await eval_stage.evaluate_all(
+                serialized_results, checks, INBOUND_AGENT_CHANNEL
+            )
 
             return {"output": final_serial_results}
 
@@ -277,6 +292,21 @@ async def run_tests(main_data):
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from lifecycle import run_until_terminated
+    from profiler import profiling
+
+    # Set up logging only when run as a worker, not when imported
+    logging.basicConfig(
+        level=logging.DEBUG,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    print("Starting subprocess")
+
+    # Load environment variables
+    load_dotenv(override=True)
+
     try:
         raw_input = sys.stdin.read()
         if not raw_input:
@@ -284,8 +314,21 @@ if __name__ == "__main__":
             sys.exit(1)
 
         main_data = json.loads(raw_input)
-        output = asyncio.run(run_tests(main_data))
+        # server_v2 passes the port and caller number this worker may use
+        with profiling(os.getenv("WORKER_PROFILE_DIR"), f"inbound-{os.getpid()}"):
+            output = asyncio.run(
+                run_until_terminated(
+                    run_tests(
+                        main_data,
+                        port=int(os.getenv("WORKER_PORT", "8765")),
+                        caller_number=os.getenv("WORKER_CALLER_NUMBER"),
+                    )
+                )
+            )
         print(json.dumps(output), flush=True)
+    except asyncio.CancelledError:
+        print(json.dumps({"error": "[Subprocess] Run cancelled"}), flush=True)
+        sys.exit(1)
     except json.JSONDecodeError as e:
         print(
             json.dumps({"error": f"[Subprocess] Invalid JSON input: {str(e)}"}),
@@ -0,0 +1,112 @@
+import functools
+import http.server
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server_v2
+from recording_store import RecordingStore, recording_id
+
+AUDIO = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """Recordings served over HTTP from a local directory, like a provider's URLs"""
+    served = tmp_path / "origin"
+    served.mkdir()
+    for name in ("a.wav", "b.wav"):
+        (served / name).write_bytes(AUDIO)
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=str(served)
+    )
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordingStore(root=str(tmp_path / "recordings"), workers=2, transcode="")
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(server_v2, "recording_store", store)
+    return TestClient(server_v2.app)
+
+
+def stored_id(store, url):
+    key = store.submit(url)
+    assert store.wait(key, timeout=10) is not None
+    return key
+
+
+def test_same_audio_behind_two_urls_is_stored_once(store, origin):
+    first = stored_id(store, f"{origin}/a.wav")
+    second = stored_id(store, f"{origin}/b.wav")
+
+    assert first != second
+    assert store.lookup(first)["path"] == store.lookup(second)["path"]
+    objects = [
+        name
+        for _, _, names in os.walk(os.path.join(store.root, "objects"))
+        for name in names
+    ]
+    assert len(objects) == 1
+
+
+def test_submit_returns_the_url_recording_id(store, origin):
+    url = f"{origin}/a.wav"
+    assert stored_id(store, url) == recording_id(url)
+
+
+def test_full_read(store, origin, client):
+    key = stored_id(store, f"{origin}/a.wav")
+
+    response = client.get(f"/recordings/{key}")
+
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert int(response.headers["content-length"]) == len(AUDIO)
+
+
+@pytest.mark.parametrize(
+    "header, start, end",
+    [
+        ("bytes=100-199", 100, 199),
+        ("bytes=10000-", 10000, len(AUDIO) - 1),
+        ("bytes=-50", len(AUDIO) - 50, len(AUDIO) - 1),
+        ("bytes=10000-99999", 10000, len(AUDIO) - 1),
+    ],
+)
+def test_range_read(store, origin, client, header, start, end):
+    key = stored_id(store, f"{origin}/a.wav")
+
+    response = client.get(f"/recordings/{key}", headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(AUDIO)}"
+    assert response.content == AUDIO[start : end + 1]
+
+
+@pytest.mark.parametrize("header", [f"bytes={len(AUDIO)}-", "bytes=200-100"])
+def test_unsatisfiable_range(store, origin, client, header):
+    key = stored_id(store, f"{origin}/a.wav")
+
+    response = client.get(f"/recordings/{key}", headers={"Range": header})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(AUDIO)}"
+
+
+def test_unknown_recording(client):
+    assert client.get(f"/recordings/{'0' * 32}").status_code == 404
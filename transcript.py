@@ -0,0 +1,128 @@
+import os
+import re
+
+from rate_limiter import estimate_tokens
+
+# Roles after the evaluator swap: the tester persona speaks as "assistant" in
+# the raw call transcripts and becomes "user"; everything else is the "AI"
+# agent under test.
+AGENT_ROLE = "AI"
+CALLER_ROLE = "user"
+
+ROLE_TAGS = {AGENT_ROLE: "A", CALLER_ROLE: "U"}
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("EVAL_TRANSCRIPT_TOKEN_BUDGET", "6000"))
+
+# Turns always kept at each end of a budgeted transcript
+EDGE_TURNS = 2
+
+STOPWORDS = {
+    "the", "and", "that", "this", "with", "from", "agent", "user", "does",
+    "should", "their", "they", "about", "when", "into", "only", "have", "will",
+    "unless", "other", "been", "than", "then", "them", "what", "which",
+}
+
+
+class Turn:
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+
+    def render(self) -> str:
+        return f"{ROLE_TAGS.get(self.role, self.role)}: {self.content}"
+
+
+class CompactTranscript:
+    """Role-swapped call transcript, converted once and shared by the evaluators"""
+
+    __slots__ = ("turns",)
+
+    def __init__(self, turns: list[Turn]):
+        self.turns = turns
+
+    @classmethod
+    def from_messages(cls, messages: list[dict]) -> "CompactTranscript":
+        """Build from a raw OpenAI-format transcript, dropping system messages"""
+        return cls(
+            [
+                Turn(
+                    CALLER_ROLE if message["role"] == "assistant" else AGENT_ROLE,
+                    " ".join((message.get("content") or "").split()),
+                )
+                for message in messages
+                if message["role"] != "system"
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def to_messages(self) -> list[dict]:
+        return [{"role": turn.role, "content": turn.content} for turn in self.turns]
+
+    def by_roles(self, roles: set[str]) -> list[Turn]:
+        return [turn for turn in self.turns if turn.role in roles]
+
+    def render(self) -> str:
+        """Dense one-line-per-turn format: "A:" is the AI agent, "U:" the user"""
+        return "\n".join(turn.render() for turn in self.turns)
+
+    def render_budgeted(self, max_tokens: int = DEFAULT_TOKEN_BUDGET, focus: str = "") -> str:
+        """Render within roughly `max_tokens`, keeping the most relevant turns.
+
+        The opening and closing turns are always kept; the middle turns are
+        ranked by how many words they share with `focus` (usually the criteria
+        being evaluated) and added until the budget runs out.
+        """
+        lines = [turn.render() for turn in self.turns]
+        costs = [estimate_tokens(line) + 1 for line in lines]
+        if sum(costs) <= max_tokens:
+            return "\n".join(lines)
+
+        count = len(lines)
+        edges = set(range(min(EDGE_TURNS, count))) | set(range(max(0, count - EDGE_TURNS), count))
+        keep = set()
+        used = 0
+        for idx in sorted(edges):
+            if used + costs[idx] <= max_tokens:
+                keep.add(idx)
+                used += costs[idx]
+
+        focus_words = focus_terms(focus)
+        middle = [idx for idx in range(count) if idx not in edges]
+        # Relevance first, then prefer agent turns, then earlier turns
+        middle.sort(
+            key=lambda idx: (
+                -len(focus_words & focus_terms(self.turns[idx].content)),
+                self.turns[idx].role != AGENT_ROLE,
+                idx,
+            )
+        )
+        for idx in middle:
+            if used + costs[idx] <= max_tokens:
+                keep.add(idx)
+                used += costs[idx]
+
+        rendered = []
+        skipped = 0
+        for idx in range(count):
+            if idx in keep:
+                if skipped:
+                    rendered.append(f"[... {skipped} turns omitted ...]")
+                    skipped = 0
+                rendered.append(lines[idx])
+            else:
+                skipped += 1
+        if skipped:
+            rendered.append(f"[... {skipped} turns omitted ...]")
+        return "\n".join(rendered)
+
+
+def focus_terms(text: str) -> set[str]:
+    return {
+        word
+        for word in re.findall(r"[a-z0-9]+", text.lower())
+        if len(word) > 3 and word not in STOPWORDS
+    }
@@ -0,0 +1,185 @@
+import math
+from statistics import NormalDist
+
+from pipeline import error_result
+
+
+def wilson_interval(passes: int, trials: int, z: float) -> tuple[float, float]:
+    """Wilson score interval for a pass rate"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = passes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = (
+        z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    )
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+# Trial counts at which we check for a verdict grow geometrically, so the
+# peeking correction pays for a handful of looks rather than one per trial
+LOOK_GROWTH = 1.5
+
+
+def look_points(min_trials: int, max_trials: int) -> list[int]:
+    """Graded-trial counts at which the intervals are checked"""
+    points = []
+    n = max(1, min_trials)
+    while n < max_trials:
+        points.append(n)
+        n = max(n + 1, math.ceil(n * LOOK_GROWTH))
+    points.append(max_trials)
+    return points
+
+
+def sequential_z(confidence: float, looks: int) -> float:
+    """Critical value that stays valid across every look we take.
+
+    The error budget is split evenly across the looks (Bonferroni), so
+    stopping at the first look whose interval clears the threshold still
+    holds the overall confidence level.
+    """
+    alpha = (1 - confidence) / max(1, looks)
+    return NormalDist().inv_cdf(1 - alpha / 2)
+
+
+class TrialTracker:
+    """Running pass counts per evaluation across repeated calls of one test.
+
+    An evaluation is settled once its sequential Wilson interval lies wholly
+    above (pass) or below (fail) the target pass rate.
+    """
+
+    def __init__(
+        self,
+        eval_names: list[str],
+        pass_rate: float,
+        confidence: float,
+        min_trials: int,
+        max_trials: int,
+    ):
+        self.pass_rate = pass_rate
+        self.confidence = confidence
+        self.min_trials = min_trials
+        self.looks = set(look_points(min_trials, max_trials))
+        self.z = sequential_z(confidence, len(self.looks))
+        self.passes = {name: 0 for name in eval_names}
+        self.graded = 0
+        self.errored = 0
+
+    def record(self, result: dict):
+        """Count one trial's serialized TestResult"""
+        evaluation = (result.get("evaluation_results") or {}).get("evaluation_results")
+        if not evaluation or result.get("error"):
+            self.errored += 1
+            return
+        self.graded += 1
+        for eval_result in evaluation:
+            if eval_result["name"] in self.passes and eval_result["passed"]:
+                self.passes[eval_result["name"]] += 1
+
+    def interval(self, name: str) -> tuple[float, float]:
+        return wilson_interval(self.passes[name], self.graded, self.z)
+
+    def verdict(self, name: str) -> str | None:
+        low, high = self.interval(name)
+        if low >= self.pass_rate:
+            return "pass"
+        if high < self.pass_rate:
+            return "fail"
+        return None
+
+    @property
+    def settled(self) -> bool:
+        """Whether to stop now; only decided at the scheduled looks"""
+        return self.graded in self.looks and all(
+            self.verdict(name) for name in self.passes
+        )
+
+    def summary(self) -> dict:
+        evaluations = {}
+        for name, passes in self.passes.items():
+            low, high = self.interval(name)
+            evaluations[name] = {
+                "passes": passes,
+                "pass_rate": round(passes / self.graded, 4) if self.graded else None,
+                "ci_low": round(low, 4),
+                "ci_high": round(high, 4),
+                "settled": self.verdict(name) is not None,
+            }
+        return {
+            "trials": self.graded,
+            "errored": self.errored,
+            "target_pass_rate": self.pass_rate,
+            "confidence": self.confidence,
+            "evaluations": evaluations,
+        }
+
+
+def trial_result(test: dict, results: list[dict], tracker: TrialTracker, stopped_early: bool) -> dict:
+    """One serialized TestResult summarizing every trial of a request-shaped test.
+
+    Each evaluation passes when its interval settled above the target or,
+    if trials ran out first, when its observed pass rate reaches it. The
+    transcript and recording are those of the first failing trial, or of the
+    first trial when none failed.
+    """
+    summary = tracker.summary()
+    summary["stopped_early"] = stopped_early
+    summary["runs"] = [
+        {
+            "passed": [
+                e["passed"]
+                for e in ((r.get("evaluation_results") or {}).get("evaluation_results") or [])
+            ],
+            "stereo_recording_url": r.get("stereo_recording_url"),
+            "recording_id": r.get("recording_id"),
+            "error": r.get("error"),
+        }
+        for r in results
+    ]
+
+    evaluation_results = []
+    for e in test["evaluations"]:
+        stats = summary["evaluations"][e["eval_name"]]
+        verdict = tracker.verdict(e["eval_name"])
+        if verdict is None:
+            passed = (stats["pass_rate"] or 0.0) >= tracker.pass_rate
+        else:
+            passed = verdict == "pass"
+        evaluation_results.append(
+            {
+                "name": e["eval_name"],
+                "passed": passed,
+                "reason": (
+                    f"{stats['passes']}/{tracker.graded} trials passed, "
+                    f"{tracker.confidence:.0%} CI {stats['ci_low']:.2f}-{stats['ci_high']:.2f}"
+                    f" against target {tracker.pass_rate:.2f}"
+                    + ("" if verdict else " (not settled)")
+                ),
+                "tier": "trials",
+            }
+        )
+
+    graded = [r for r in results if r.get("evaluation_results") and not r.get("error")]
+    failing = [
+        r
+        for r in graded
+        if not all(e["passed"] for e in r["evaluation_results"]["evaluation_results"])
+    ]
+    representative = (failing or graded or results or [{}])[0]
+
+    return {
+        "test": representative.get("test") or error_result(test, None)["test"],
+        "evaluation_results": (
+            {"evaluation_results": evaluation_results, "extra_data": {"trials": summary}}
+            if tracker.graded
+            else None
+        ),
+        "transcript": representative.get("transcript") or [],
+        "stereo_recording_url": representative.get("stereo_recording_url"),
+        "recording_id": representative.get("recording_id"),
+        "call_seconds": representative.get("call_seconds"),
+        "error": None if tracker.graded else representative.get("error"),
+    }